@@ -1,25 +1,68 @@
+import json
 import logging
+from copy import deepcopy
+from functools import partial
+from threading import Lock, Thread
 from time import time
 from types import ModuleType
 from typing import Callable, Dict, Type
 import numpy as np
+from flask import Response
 from policyengine_core.taxbenefitsystems import TaxBenefitSystem
 from policyengine_core.simulations import SimulationBuilder, Simulation
-from policyengine_core.model_api import Enum
 from policyengine_core.reforms import Reform
 from policyengine.country.openfisca.computation_trees import (
-    get_computation_trees_json,
+    TraceGraph,
+    get_trace_graph,
 )
 from policyengine.country.openfisca.entities import build_entities
-from policyengine.country.openfisca.parameters import build_parameters
-from policyengine.country.openfisca.reforms import apply_reform, PolicyReform
+from policyengine.country.openfisca.households import (
+    calculate_households,
+    fill_requested_computations,
+    get_requested_computations,
+    merge_households,
+)
+from policyengine.country.openfisca.metadata import (
+    MetadataBundle,
+    encode_metadata,
+    get_metadata_bundle_key,
+)
+from policyengine.country.openfisca.parameters import (
+    NOW,
+    ParameterMetadataHistory,
+    build_parameters,
+    parse_date,
+    remove_null_scale_brackets,
+)
+from policyengine.country.openfisca.reforms import (
+    HOUSEHOLD_VIEW_PARAMETERS,
+    apply_reform,
+    clone_system,
+    PolicyReform,
+)
+from policyengine.country.openfisca.snapshots import (
+    BaselineSnapshot,
+    get_baseline_snapshot_key,
+)
+from policyengine.country.household_pool import HouseholdPool
 from policyengine.country.openfisca.variables import build_variables
 from policyengine.country.results_config import PolicyEngineResultsConfig
 from policyengine.impact.household.earnings_impact import earnings_impact
+from policyengine.impact.household.earnings_sweep import (
+    get_sweep_arrays,
+    vary_earnings,
+)
 from policyengine.impact.population.charts.age import age_chart
-from policyengine.web_server.cache import PolicyEngineCache, cached_endpoint
+from policyengine.web_server.cache import (
+    PolicyEngineCache,
+    LRUStore,
+    cached_endpoint,
+    dict_hash,
+    memoised_endpoint,
+    reports_progress,
+)
 from policyengine.web_server.logging import PolicyEngineLogger
-import dpath
+from policyengine.package import POLICYENGINE_STORAGE_PATH
 from policyengine.impact.population.charts import (
     decile_chart,
     inequality_chart,
@@ -30,8 +73,10 @@ from policyengine.impact.population.charts import (
 from policyengine.impact.population.by_provision import (
     get_breakdown_and_chart_per_provision,
 )
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.impact.population.metrics import headline_metrics
 from policyengine_core.data import Dataset
+from openfisca_tools import Microsimulation
 
 
 class PolicyEngineCountry:
@@ -60,6 +105,30 @@ class PolicyEngineCountry:
     dataset: Dataset = None
     dataset_year: int = None
 
+    reformed_system_cache_size: int = 32
+    """The number of reformed tax-benefit systems kept for reuse by household-level requests.
+    """
+
+    parameter_date_cache_size: int = 32
+    """The number of dates for which encoded parameter metadata is kept.
+    """
+
+    trace_graph_cache_size: int = 16
+    """The number of traced household simulations kept for the computation tree endpoints.
+    """
+
+    adaptive_earnings_sweep: bool = False
+    """Whether household earnings variation charts simulate a coarse grid of earnings, refined only around kinks and cliffs, rather than a fine grid.
+    """
+
+    household_variation_workers: int = 0
+    """The number of workers this country adds to the household pool, which varies the earnings of reformed households while the baseline is varied in the request's own process. If zero, or when cached endpoints run in worker processes, the baseline and reform are varied one after the other.
+    """
+
+    household_variation_timeout: float = 60
+    """The number of seconds to wait for the household pool to vary a reformed household, before varying it in the request's own process instead.
+    """
+
     def __init__(self):
         self.api_endpoints = dict(
             entities=self.entities,
@@ -72,8 +141,10 @@ class PolicyEngineCountry:
             endpoint_runtimes=self.endpoint_runtimes,
             household_variation=self.household_variation,
             computation_tree=self.computation_tree,
+            computation_graph=self.computation_graph,
             dependencies=self.dependencies,
             leaf_nodes=self.leaf_nodes,
+            household_analysis=self.household_analysis,
             age_chart=self.age_chart,
             population_breakdown=self.population_breakdown,
             auto_ubi=self.auto_ubi,
@@ -95,11 +166,11 @@ class PolicyEngineCountry:
         if self.default_reform is not None:
             apply_reform(self.default_reform, self.tax_benefit_system)
 
-        self.entity_data = build_entities(self.tax_benefit_system)
-        self.variable_data = build_variables(self.tax_benefit_system)
-        self.parameter_data = build_parameters(self.tax_benefit_system)
-
-        self.baseline_microsimulation = None
+        self._init_metadata()
+        # Variable multipliers have never been applied: the original check
+        # looked for metadata on variable names, so matched none. Applying
+        # them would change population results, so none are listed.
+        self.multiplier_variables: Dict[str, float] = {}
 
         self.endpoint_runtimes = dict(
             population_impact_reform_only=[10],
@@ -108,6 +179,68 @@ class PolicyEngineCountry:
             household_variation_reform_and_baseline=[20],
             auto_ubi=[10],
             age_chart=[10],
+            microsimulation_multipliers=[0],
+        )
+
+        self.reformed_systems = LRUStore(
+            self.reformed_system_cache_size, size_of=lambda system: 1
+        )
+        self.provision_step_impacts = LRUStore(2**20)
+        self.parameter_history: ParameterMetadataHistory = None
+        self.parameter_history_lock = Lock()
+        self.parameters_by_date = LRUStore(
+            self.parameter_date_cache_size, size_of=lambda encoded: 1
+        )
+        self.trace_graphs = LRUStore(
+            self.trace_graph_cache_size, size_of=lambda graph: 1
+        )
+
+        self.baseline_microsimulation = None
+        self.baseline_snapshot_thread: Thread = None
+        self.baseline_snapshot_lock = Lock()
+        if self.baseline_snapshot.exists():
+            self.baseline_microsimulation = (
+                self.create_baseline_microsimulation()
+            )
+
+        self.household_pool: HouseholdPool = None
+
+    def _init_metadata(self):
+        """Initialises the entity, variable and parameter metadata, loading it from the on-disk bundle if one exists."""
+        bundle = MetadataBundle(
+            POLICYENGINE_STORAGE_PATH / "metadata",
+            get_metadata_bundle_key(
+                self.openfisca_country_model, self.default_reform
+            ),
+        )
+        if bundle.exists():
+            self.encoded_metadata = bundle.load()
+            # Building parameter metadata also removes empty scale brackets,
+            # which simulations rely on.
+            remove_null_scale_brackets(self.tax_benefit_system.parameters, NOW)
+        else:
+            self.encoded_metadata = dict(
+                entities=encode_metadata(
+                    build_entities(self.tax_benefit_system)
+                ),
+                variables=encode_metadata(
+                    build_variables(self.tax_benefit_system)
+                ),
+                parameters=encode_metadata(
+                    build_parameters(self.tax_benefit_system)
+                ),
+            )
+            bundle.save(self.encoded_metadata)
+        # Decode from the bundle even when just built, so that the metadata
+        # is identical on every boot.
+        self.entity_data, self.variable_data, self.parameter_data = (
+            json.loads(self.encoded_metadata[name])
+            for name in ("entities", "variables", "parameters")
+        )
+
+    def _metadata_response(self, name: str) -> Response:
+        return Response(
+            self.encoded_metadata[name], mimetype="application/json"
         )
 
     def create_reform(self, parameters: dict) -> PolicyReform:
@@ -123,6 +256,17 @@ class PolicyEngineCountry:
             parameters, self.parameter_data, default_reform=self.default_reform
         )
 
+    def canonical_parameters(self, parameters: dict) -> dict:
+        """Puts request parameters in a canonical form, so that requests for the same policies are identified alike in the cache.
+
+        Args:
+            parameters (dict): The request parameters.
+
+        Returns:
+            dict: The canonical parameters.
+        """
+        return self.create_reform(parameters).canonical_parameters
+
     def create_microsimulations(
         self,
         parameters: dict,
@@ -142,70 +286,206 @@ class PolicyEngineCountry:
             and self.baseline_microsimulation is None
             and not do_not_cache
         ):
-            try:
-                baseline = (
-                    self.baseline_microsimulation
-                ) = self.microsimulation_type(
-                    reform=self.default_reform, dataset=self.dataset
-                )
-            except OSError:
-                logging.warning("Dataset corrupted, re-downloading.")
-                self.dataset.download(self.dataset_year)
-                baseline = (
-                    self.baseline_microsimulation
-                ) = self.microsimulation_type(
-                    reform=self.default_reform, dataset=self.dataset
-                )
-
+            baseline = (
+                self.baseline_microsimulation
+            ) = self.create_baseline_microsimulation()
         elif policy_reform.edits_baseline or force_refresh_baseline:
             baseline = self.microsimulation_type(reform=policy_reform.baseline)
         else:
             baseline = self.baseline_microsimulation
         reformed = self.microsimulation_type(reform=policy_reform.reform)
 
-        # Apply multipliers
-
         for simulation in (baseline, reformed):
-            for variable in simulation.tax_benefit_system.variables:
-                if (
-                    hasattr(variable, "metadata")
-                    and variable.metadata.get("multiplier") is not None
-                ):
-                    multiplier = variable.metadata.get("multiplier")
-                    values = simulation.calc(variable.name)
-                    new_values = values * multiplier
-                    simulation.set_input(variable.name, new_values)
+            # The cached baseline has its multipliers applied on creation.
+            if simulation is not self.baseline_microsimulation:
+                self.apply_multipliers(simulation)
 
         return baseline, reformed
 
-    def create_individualsims(self, parameters: dict, situation: dict):
-        """Generate a individual simulations from PolicyEngine parameters.
+    def apply_multipliers(self, simulation: Microsimulation):
+        """Scales variables with a multiplier in their metadata.
+
+        No variables are currently scaled (see `multiplier_variables`), so this only records its runtime.
+
+        Args:
+            simulation (Microsimulation): The simulation to modify.
+        """
+        start_time = time()
+        self.endpoint_runtimes["microsimulation_multipliers"].append(
+            time() - start_time
+        )
+
+    @property
+    def baseline_snapshot(self) -> BaselineSnapshot:
+        """The on-disk snapshot of the cached baseline microsimulation."""
+        return BaselineSnapshot(
+            POLICYENGINE_STORAGE_PATH / "baselines",
+            get_baseline_snapshot_key(
+                self.openfisca_country_model,
+                self.dataset_year,
+                self.default_reform,
+            ),
+        )
+
+    def create_baseline_microsimulation(self) -> Microsimulation:
+        """Generates the baseline microsimulation shared between population requests, loading computed arrays from a snapshot if one exists.
+
+        Returns:
+            Microsimulation: The baseline microsimulation.
+        """
+        try:
+            baseline = self.microsimulation_type(
+                reform=self.default_reform, dataset=self.dataset
+            )
+        except OSError:
+            logging.warning("Dataset corrupted, re-downloading.")
+            self.dataset.download(self.dataset_year)
+            baseline = self.microsimulation_type(
+                reform=self.default_reform, dataset=self.dataset
+            )
+        snapshot = self.baseline_snapshot
+        if snapshot.exists():
+            # The snapshot includes inputs after applying multipliers.
+            snapshot.load(baseline.simulation)
+        else:
+            self.apply_multipliers(baseline)
+        return baseline
+
+    def save_baseline_snapshot(self):
+        """Stores the arrays computed so far by the cached baseline microsimulation, if no snapshot exists yet."""
+        if self.baseline_microsimulation is None:
+            return
+        snapshot = self.baseline_snapshot
+        if not snapshot.exists():
+            try:
+                snapshot.save(self.baseline_microsimulation.simulation)
+            except OSError as e:
+                logging.warning(f"Could not save baseline snapshot: {e}")
+
+    def start_baseline_snapshot(self):
+        """Starts saving the baseline snapshot in a background thread, unless one exists or is already being saved by this process."""
+        with self.baseline_snapshot_lock:
+            if (
+                self.baseline_snapshot_thread is not None
+                or self.baseline_snapshot.exists()
+            ):
+                return
+            self.baseline_snapshot_thread = Thread(
+                target=self.save_baseline_snapshot, daemon=True
+            )
+            self.baseline_snapshot_thread.start()
+
+    def has_individual_reform(self, parameters: dict) -> bool:
+        """Whether PolicyEngine parameters for a household describe a reform, as well as the household and baseline.
+
+        Args:
+            parameters (dict): The PolicyEngine parameters.
+        """
+        return len(parameters) > (
+            2 if "baseline_policy_date" in parameters else 1
+        )
+
+    def create_individualsim(
+        self, parameters: dict, situation: dict, reform: bool = False
+    ):
+        """Generate an individual simulation from PolicyEngine parameters.
 
         Args:
             parameters (dict): The PolicyEngine parameters.
             situation (dict): The OpenFisca situation JSON.
+            reform (bool, optional): Whether to simulate the reform rather than the baseline. Defaults to False.
         """
         policy_reform = self.create_reform(parameters)
+        sim = self.individualsim_type(
+            reform=policy_reform.reform if reform else policy_reform.baseline
+        )
+        sim.situation_data = situation
+        sim.build()
         policy_date = parameters.get("baseline_policy_date")
-        baseline = self.individualsim_type(reform=policy_reform.baseline)
-        baseline.situation_data = situation
-        baseline.build()
-        if len(parameters) > (
-            2 if "baseline_policy_date" in parameters else 1
-        ):
-            reformed = self.individualsim_type(reform=policy_reform.reform)
-            reformed.situation_data = situation
-            reformed.build()
-        else:
-            reformed = None
         if policy_date is not None:
-            year = int(str(policy_date)[:4])
-            baseline.default_calculation_period = year
-            if reformed is not None:
-                reformed.default_calculation_period = year
+            sim.default_calculation_period = int(str(policy_date)[:4])
+        return sim
 
+    def create_individualsims(self, parameters: dict, situation: dict):
+        """Generate a individual simulations from PolicyEngine parameters.
+
+        Args:
+            parameters (dict): The PolicyEngine parameters.
+            situation (dict): The OpenFisca situation JSON.
+        """
+        baseline = self.create_individualsim(parameters, situation)
+        if self.has_individual_reform(parameters):
+            reformed = self.create_individualsim(
+                parameters, situation, reform=True
+            )
+        else:
+            reformed = None
         return baseline, reformed
 
+    def get_reform_sweep_arrays(
+        self, params: dict, earnings_variable: str, vary_max: float
+    ) -> dict:
+        """Varies the earnings of a reformed household.
+
+        Args:
+            params (dict): Policy reform parameters, and a 'household' entry.
+            earnings_variable (str): The earnings variable to vary.
+            vary_max (float): The maximum earnings.
+
+        Returns:
+            dict: The arrays of the varied simulation (see `get_sweep_arrays`).
+        """
+        reformed = self.create_individualsim(
+            params, params["household"], reform=True
+        )
+        vary_earnings(
+            reformed,
+            None,
+            earnings_variable,
+            vary_max,
+            self.results_config,
+            step=100,
+            adaptive=self.adaptive_earnings_sweep,
+        )
+        return get_sweep_arrays(
+            reformed, earnings_variable, self.results_config
+        )
+
+    def sweep_reform_earnings(
+        self, params: dict, earnings_variable: str, vary_max: float
+    ) -> Callable[[], dict]:
+        """Starts varying the earnings of a reformed household in the household pool.
+
+        Args:
+            params (dict): Policy reform parameters, and a 'household' entry.
+            earnings_variable (str): The earnings variable to vary.
+            vary_max (float): The maximum earnings.
+
+        Returns:
+            Callable[[], dict]: A function waiting for the arrays of the varied simulation (see `get_sweep_arrays`), which varies the household in this process instead if the worker fails or takes longer than `household_variation_timeout`. A worker which times out keeps going until it finishes, as running sweeps can't be stopped.
+        """
+        # Parameters are sent after this returns, and the baseline adds axes
+        # to the same situation meanwhile.
+        params = deepcopy(params)
+        future = self.household_pool.sweep_reform_earnings(
+            self.name, params, earnings_variable, vary_max
+        )
+
+        def get_arrays() -> dict:
+            try:
+                return future.result(timeout=self.household_variation_timeout)
+            except Exception as e:
+                # Only stops the sweep if it hasn't started yet.
+                future.cancel()
+                logging.warning(
+                    f"Varying a reformed household in the household pool failed ({e!r}), so it is varied in this process."
+                )
+                return self.get_reform_sweep_arrays(
+                    params, earnings_variable, vary_max
+                )
+
+        return get_arrays
+
     def create_openfisca_simulation(self, parameters: dict) -> Simulation:
         """Initialises an OpenFisca simulation from given household or reform parameters (optimised for performance by skipping no-reform applications).
 
@@ -215,35 +495,90 @@ class PolicyEngineCountry:
         Returns:
             Simulation: The OpenFisca Simulation object.
         """
-        if len(parameters) == 1:
-            # Cache the tax-benefit system for no-reform simulations
-            system = self.tax_benefit_system
-        else:
-            reform = self.create_reform(parameters)
-            system = apply_reform(
-                reform.reform, self.tax_benefit_system_type()
-            )
+        system = self.get_reformed_system(parameters)
         return Simulation(
             tax_benefit_system=system,
             situation=parameters["household"],
         )
 
-    def entities(self, params: dict, logger: PolicyEngineLogger) -> dict:
+    def get_reformed_system(self, parameters: dict) -> TaxBenefitSystem:
+        """Gets the tax-benefit system of the reform described by PolicyEngine parameters, reusing systems built for earlier requests with the same policy.
+
+        New systems are copied from the default system, copying only the parameters the reform modifies, unless the reform needs the country model rebuilt (with a policy date or a structural reform).
+
+        Args:
+            parameters (dict): The PolicyEngine parameters.
+
+        Returns:
+            TaxBenefitSystem: The reformed system.
+        """
+        policy = self.create_reform(
+            self.canonical_parameters(parameters)
+        ).reform
+        if "reform" in policy.parameters:
+            return apply_reform(policy, self.tax_benefit_system_type())
+        if not policy.parameters and not policy.baseline_parameters:
+            # No reform: use the default system.
+            return self.tax_benefit_system
+        key = dict_hash(
+            dict(
+                parameters=policy.parameters,
+                baseline_parameters=policy.baseline_parameters,
+            )
+        )
+        system = self.reformed_systems.get(key)
+        if system is not None:
+            return system
+        if "policy_date" in policy.parameters:
+            system = apply_reform(policy, self.tax_benefit_system_type())
+        else:
+            system = policy.apply_parameters(
+                clone_system(
+                    self.tax_benefit_system, policy.modified_parameters
+                )
+            )
+        self.reformed_systems.set(key, system)
+        return system
+
+    def entities(self, params: dict, logger: PolicyEngineLogger) -> Response:
         """Get the available entities for the OpenFisca country model."""
-        return self.entity_data
+        return self._metadata_response("entities")
 
-    def variables(self, params: dict, logger: PolicyEngineLogger) -> dict:
+    def variables(self, params: dict, logger: PolicyEngineLogger) -> Response:
         """Get the available entities for the OpenFisca country model."""
-        return self.variable_data
+        return self._metadata_response("variables")
 
-    def parameters(self, params: dict, logger: PolicyEngineLogger) -> dict:
+    def parameters(self, params: dict, logger: PolicyEngineLogger) -> Response:
         """Get the available entities for the OpenFisca country model."""
         if "policy_date" in params:
-            return build_parameters(
-                self.baseline_tax_benefit_system,
-                date=params.get("policy_date"),
+            return Response(
+                self.get_parameters_at(params["policy_date"]),
+                mimetype="application/json",
             )
-        return self.parameter_data
+        return self._metadata_response("parameters")
+
+    def get_parameters_at(self, date: str) -> bytes:
+        """Gets the encoded baseline parameter metadata at a date, reusing it for recently requested dates.
+
+        Args:
+            date (str): The date, in the form YYYY-MM-DD.
+
+        Returns:
+            bytes: The parameter metadata, as JSON.
+        """
+        date = parse_date(date)
+        encoded = self.parameters_by_date.get(date)
+        if encoded is not None:
+            return encoded
+        with self.parameter_history_lock:
+            # Indexed on first use, since most boots never need it.
+            if self.parameter_history is None:
+                self.parameter_history = ParameterMetadataHistory(
+                    self.baseline_tax_benefit_system
+                )
+        encoded = encode_metadata(self.parameter_history.build(date))
+        self.parameters_by_date.set(date, encoded)
+        return encoded
 
     def parameter(self, params: dict, logger: PolicyEngineLogger) -> dict:
         """Get a specific parameter."""
@@ -266,56 +601,35 @@ class PolicyEngineCountry:
             "budgetary_impact": difference,
         }
 
+    @memoised_endpoint
     def calculate(
         self,
         params: dict,
         logger: PolicyEngineLogger,
     ) -> dict:
-        """Calculate variables for a given household and policy reform."""
+        """Calculate variables for a given household and policy reform, or for each of a batch of households (given as `households`) in a single simulation."""
+        if "households" in params:
+            merged_households = merge_households(
+                params["households"], self.tax_benefit_system
+            )
+            simulation = self.create_openfisca_simulation(
+                {**params, "household": merged_households}
+            )
+            return dict(
+                households=calculate_households(
+                    simulation, params["households"]
+                )
+            )
         simulation = self.create_openfisca_simulation(params)
-        system = simulation.tax_benefit_system
-
-        requested_computations = dpath.util.search(
-            params["household"],
-            "*/*/*/*",
-            afilter=lambda t: t is None,
-            yielded=True,
-        )
-        computation_results = {}
-
-        for computation in requested_computations:
-            path = computation[0]
-            entity_plural, entity_id, variable_name, period = path.split("/")
-            variable = system.get_variable(variable_name)
-            result = simulation.calculate(variable_name, period)
-            population = simulation.get_population(entity_plural)
-            try:
-                entity_index = population.get_index(entity_id)
-
-                if variable.value_type == Enum:
-                    entity_result = result.decode()[entity_index].name
-                elif variable.value_type == float:
-                    entity_result = float(str(result[entity_index]))
-                elif variable.value_type == str:
-                    entity_result = str(result[entity_index])
-                else:
-                    entity_result = result.tolist()[entity_index]
-
-                # Bug fix, unclear of the root cause
-
-                if (
-                    isinstance(entity_result, list)
-                    and len(entity_result) > 2_000
-                ):
-                    entity_result = {period: entity_result[-1]}
-            except:
-                # In cases of axes, the entity ID won't resolve (e.g. you requested a value for person, but instead there's on person1, person2, ...)
-                entity_result = list(result.astype(float))
-
-            dpath.util.new(computation_results, path, entity_result)
-
-        dpath.util.merge(params["household"], computation_results)
-
+        fill_requested_computations(
+            simulation,
+            (
+                (params["household"], computation, computation[1])
+                for computation in list(
+                    get_requested_computations(params["household"])
+                )
+            ),
+        )
         return params["household"]
 
     def endpoint_runtimes(
@@ -330,51 +644,76 @@ class PolicyEngineCountry:
         return average_runtimes
 
     @cached_endpoint
+    @reports_progress
     def population_reform(
-        self, params: dict, logger: PolicyEngineLogger
+        self,
+        params: dict,
+        logger: PolicyEngineLogger,
+        progress: Callable[[dict], None] = None,
     ) -> dict:
-        """Compute the population-level impact of a reform."""
+        """Compute the population-level impact of a reform.
+
+        Headline metrics, then each chart, are reported as partial results as soon as they are computed, with the slowest charts last.
+        """
         start_time = time()
         edits_baseline = any(["baseline_" in param for param in params])
         baseline, reformed = self.create_microsimulations(params)
-        rel_income_decile_chart, avg_income_decile_chart = decile_chart(
-            baseline, reformed, self.results_config
+        config = self.results_config
+        frame = PopulationImpactFrame(baseline, reformed, config)
+        result = {}
+
+        def add_to_result(**outputs):
+            result.update(outputs)
+            if progress is not None:
+                # Copied, as the result changes while partial results are
+                # being served.
+                progress(dict(result))
+
+        add_to_result(
+            **headline_metrics(baseline, reformed, config, frame=frame)
         )
-        rel_wealth_decile_chart, avg_wealth_decile_chart = decile_chart(
-            baseline,
-            reformed,
-            self.results_config,
-            decile_type="wealth",
+        rel_income_decile_chart, avg_income_decile_chart = decile_chart(
+            baseline, reformed, config, frame=frame
         )
-        result = dict(
-            **headline_metrics(baseline, reformed, self.results_config),
+        add_to_result(
             rel_income_decile_chart=rel_income_decile_chart,
             avg_income_decile_chart=avg_income_decile_chart,
+        )
+        rel_wealth_decile_chart, avg_wealth_decile_chart = decile_chart(
+            baseline, reformed, config, decile_type="wealth", frame=frame
+        )
+        add_to_result(
             rel_wealth_decile_chart=rel_wealth_decile_chart,
             avg_wealth_decile_chart=avg_wealth_decile_chart,
+        )
+        add_to_result(
             poverty_chart=poverty_chart(
-                baseline, reformed, False, self.results_config
-            ),
+                baseline, reformed, False, config, frame=frame
+            )
+        )
+        add_to_result(
             deep_poverty_chart=poverty_chart(
-                baseline, reformed, True, self.results_config
-            ),
+                baseline, reformed, True, config, frame=frame
+            )
+        )
+        add_to_result(
             waterfall_chart=waterfall_chart(
-                baseline, reformed, self.results_config
-            ),
-            intra_income_decile_chart=intra_decile_chart(
-                baseline, reformed, self.results_config
-            ),
-            intra_wealth_decile_chart=intra_decile_chart(
-                baseline,
-                reformed,
-                self.results_config,
-                decile_type="wealth",
-            ),
+                baseline, reformed, config, frame=frame
+            )
+        )
+        add_to_result(
             inequality_chart=inequality_chart(
-                baseline,
-                reformed,
-                self.results_config,
-            ),
+                baseline, reformed, config, frame=frame
+            )
+        )
+        add_to_result(
+            intra_income_decile_chart=intra_decile_chart(
+                baseline, reformed, config, frame=frame
+            )
+        )
+        # The complete result is stored when the task completes.
+        result["intra_wealth_decile_chart"] = intra_decile_chart(
+            baseline, reformed, config, decile_type="wealth", frame=frame
         )
         classification = (
             "reform_and_baseline" if edits_baseline else "reform_only"
@@ -382,6 +721,9 @@ class PolicyEngineCountry:
         self.endpoint_runtimes[f"population_impact_{classification}"].append(
             time() - start_time
         )
+        if baseline is self.baseline_microsimulation:
+            # Every baseline output the charts need has now been computed.
+            self.start_baseline_snapshot()
         return result
 
     @cached_endpoint
@@ -408,10 +750,26 @@ class PolicyEngineCountry:
     def household_variation(self, params=None, logger=None):
         """Compute how changes in earnings affect household income."""
         start_time = time()
-        baseline, reformed = self.create_individualsims(
-            params, params["household"]
+        if (
+            self.household_pool is not None
+            and self.household_pool.is_usable()
+            and self.has_individual_reform(params)
+        ):
+            baseline = self.create_individualsim(params, params["household"])
+            reformed = None
+            sweep_reform = partial(self.sweep_reform_earnings, params)
+        else:
+            baseline, reformed = self.create_individualsims(
+                params, params["household"]
+            )
+            sweep_reform = None
+        result = earnings_impact(
+            baseline,
+            reformed,
+            self.results_config,
+            adaptive=self.adaptive_earnings_sweep,
+            sweep_reform=sweep_reform,
         )
-        result = earnings_impact(baseline, reformed, self.results_config)
         has_reform = len(params) > 1
         classification = (
             "reform_and_baseline" if has_reform else "baseline_only"
@@ -421,50 +779,79 @@ class PolicyEngineCountry:
         )
         return result
 
-    def computation_tree(self, params=None):
-        """Get the computation tree for a given household (with any policy reforms applied)."""
-        simulation = self.create_openfisca_simulation(params)
-        return get_computation_trees_json(simulation, params)
+    def get_trace_graph(self, params: dict) -> TraceGraph:
+        """Gets the trace of the variables requested for a household, reusing the trace from earlier requests for the same household and policy.
 
-    def dependencies(self, params=None):
-        """Get a list of all variables needed to compute a given household simulation."""
-        simulation = self.create_openfisca_simulation(params)
-        trees = get_computation_trees_json(simulation, params)[
-            "computation_trees"
-        ]
+        Args:
+            params (dict): Policy reform parameters, and a 'household' entry.
 
-        def get_dependencies(node):
-            nodes = [node["name"]]
-            for child in node["children"]:
-                nodes += get_dependencies(child)
-            return list(set(nodes))
+        Returns:
+            TraceGraph: The trace graph.
+        """
+        key = dict_hash(
+            {
+                key: value
+                for key, value in self.canonical_parameters(params).items()
+                if key not in HOUSEHOLD_VIEW_PARAMETERS
+            }
+        )
+        graph = self.trace_graphs.get(key)
+        if graph is None:
+            graph = get_trace_graph(
+                self.create_openfisca_simulation(params), params["household"]
+            )
+            self.trace_graphs.set(key, graph)
+        return graph
 
+    @memoised_endpoint
+    def computation_tree(
+        self, params: dict, logger: PolicyEngineLogger = None
+    ) -> dict:
+        """Get the computation tree for a given household (with any policy reforms applied)."""
         return dict(
-            dependencies=list(
-                set(sum([get_dependencies(tree) for tree in trees], []))
-            )
+            computation_trees=self.get_trace_graph(params).computation_trees()
         )
 
-    def leaf_nodes(self, params=None):
-        """Get a list of the input variables involved in a given household simulation."""
-        simulation = self.create_openfisca_simulation(params)
+    @memoised_endpoint
+    def computation_graph(
+        self, params: dict, logger: PolicyEngineLogger = None
+    ) -> dict:
+        """Get the computation graph for a given household (with any policy reforms applied), with each variable included once. The depth of the graph and the number of values per variable can be limited with `max_depth` and `max_values`, and the graph can start from a given `node` (to expand it) rather than the requested variables.
 
-        trees = get_computation_trees_json(simulation, params)[
-            "computation_trees"
-        ]
+        The traced simulation is kept, so requests exploring the graph of a household in parts only trace it once.
+        """
+        return self.get_trace_graph(params).to_dag(
+            **{
+                key: int(params[key])
+                for key in HOUSEHOLD_VIEW_PARAMETERS
+                if params.get(key) is not None
+            }
+        )
 
-        def get_leaf_nodes(node):
-            if len(node["children"]) == 0:
-                return [node["name"]]
-            else:
-                return sum(
-                    [get_leaf_nodes(child) for child in node["children"]], []
-                )
+    @memoised_endpoint
+    def dependencies(
+        self, params: dict, logger: PolicyEngineLogger = None
+    ) -> dict:
+        """Get a list of all variables needed to compute a given household simulation."""
+        return dict(dependencies=self.get_trace_graph(params).dependencies())
 
+    @memoised_endpoint
+    def leaf_nodes(
+        self, params: dict, logger: PolicyEngineLogger = None
+    ) -> dict:
+        """Get a list of the input variables involved in a given household simulation."""
+        return dict(leaf_nodes=self.get_trace_graph(params).leaf_nodes())
+
+    @memoised_endpoint
+    def household_analysis(
+        self, params: dict, logger: PolicyEngineLogger = None
+    ) -> dict:
+        """Get the computation trees, dependencies and input variables of a given household simulation, from a single traced simulation."""
+        graph = self.get_trace_graph(params)
         return dict(
-            leaf_nodes=list(
-                set(sum([get_leaf_nodes(tree) for tree in trees], []))
-            )
+            computation_trees=graph.computation_trees(),
+            dependencies=graph.dependencies(),
+            leaf_nodes=graph.leaf_nodes(),
         )
 
     @cached_endpoint
@@ -479,8 +866,12 @@ class PolicyEngineCountry:
         )
 
     @cached_endpoint
-    def population_breakdown(self, params=None, logger=None):
+    @reports_progress
+    def population_breakdown(self, params=None, logger=None, progress=None):
         """Score a policy reform with a breakdown by provision."""
+        # Results are cached by the canonical parameters, so provisions set
+        # to the value they'd have anyway are left out of the breakdown.
+        params = self.canonical_parameters(params)
         baseline, reformed = self.create_microsimulations(params)
         return get_breakdown_and_chart_per_provision(
             self,
@@ -488,4 +879,8 @@ class PolicyEngineCountry:
             baseline,
             reformed,
             self.results_config,
+            progress=progress,
+            step_key=lambda step_params: dict_hash(
+                self.canonical_parameters(step_params)
+            ),
         )
@@ -0,0 +1,103 @@
+"""
+A pool of worker processes varying the earnings of reformed households, while the baseline is varied in the request's own process.
+"""
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Callable, Dict, List
+
+# Countries varying household reforms in worker processes, registered before
+# the workers are forked so that each worker inherits them (countries aren't
+# picklable).
+_HOUSEHOLD_POOL_COUNTRIES: Dict[str, "PolicyEngineCountry"] = {}
+
+
+def _sweep_reform_earnings(
+    country_name: str,
+    params: dict,
+    earnings_variable: str,
+    vary_max: float,
+) -> dict:
+    return _HOUSEHOLD_POOL_COUNTRIES[country_name].get_reform_sweep_arrays(
+        params, earnings_variable, vary_max
+    )
+
+
+class HouseholdPool:
+    """Forked worker processes varying the earnings of reformed households, shared by every country using them.
+
+    The workers are forked when the pool is created, which should be while the server has no other threads running (e.g. before cloud logging starts). Only the process creating the pool can use it: processes forked from it (e.g. cached endpoint workers) vary both simulations themselves.
+
+    For the same reason, workers are never forked again: if a worker dies (e.g. killed for using too much memory), the pool is retired and reformed households are varied in the request's process from then on. A sweep which times out can't be stopped either, so its worker stays busy until the sweep finishes.
+    """
+
+    def __init__(
+        self,
+        countries: List["PolicyEngineCountry"],
+        initializer: Callable = None,
+    ):
+        """Registers the countries and forks the workers.
+
+        Args:
+            countries (List[PolicyEngineCountry]): The countries using the pool, each adding `household_variation_workers` workers.
+            initializer (Callable, optional): A function each worker calls on starting (e.g. to start cloud logging, after forking). Defaults to None.
+        """
+        for country in countries:
+            _HOUSEHOLD_POOL_COUNTRIES[country.name] = country
+        self.max_workers = sum(
+            country.household_variation_workers for country in countries
+        )
+        self.pid = os.getpid()
+        self.broken = False
+        self.executor = ProcessPoolExecutor(
+            self.max_workers,
+            mp_context=get_context("fork"),
+            initializer=initializer,
+        )
+        # Fork every worker now, rather than on the first request.
+        wait(
+            [self.executor.submit(os.getpid) for _ in range(self.max_workers)]
+        )
+
+    def is_usable(self) -> bool:
+        """Whether the pool can be used from this process."""
+        return os.getpid() == self.pid and not self.broken
+
+    def sweep_reform_earnings(
+        self,
+        country_name: str,
+        params: dict,
+        earnings_variable: str,
+        vary_max: float,
+    ) -> Future:
+        """Starts varying the earnings of a reformed household in a worker process.
+
+        If a worker has died, the returned future fails with `BrokenProcessPool`, and the pool is retired.
+
+        Args:
+            country_name (str): The name of the country.
+            params (dict): Policy reform parameters, and a 'household' entry.
+            earnings_variable (str): The earnings variable to vary.
+            vary_max (float): The maximum earnings.
+
+        Returns:
+            Future: The arrays of the varied simulation (see `get_sweep_arrays`).
+        """
+        args = (
+            _sweep_reform_earnings,
+            country_name,
+            params,
+            earnings_variable,
+            vary_max,
+        )
+        try:
+            return self.executor.submit(*args)
+        except BrokenProcessPool as e:
+            if not self.broken:
+                logging.warning("Retiring the broken household pool.")
+                self.broken = True
+            future = Future()
+            future.set_exception(e)
+            return future
@@ -1,39 +1,205 @@
-from policyengine_core.tracers import FullTracer
-import dpath
+from collections import deque
+from typing import Dict, List, Optional
+import numpy as np
+from policyengine_core.simulations import Simulation
+from policyengine_core.tracers import FullTracer, TraceNode
+from policyengine.country.openfisca.households import (
+    get_requested_computations,
+)
 
 
-def get_computation_trees_json(simulation, params):
-    simulation.trace = True
-    simulation.tracer = FullTracer()
+def get_trace_value(value) -> Optional[list]:
+    """Converts the value of a trace node to a list of numbers, or of strings if not numeric, or None if the node has no value."""
+    if value is None:
+        return None
+    try:
+        return np.asarray(value).astype(float).tolist()
+    except:
+        try:
+            return np.asarray(value).astype(str).tolist()
+        except:
+            return None
 
-    requested_computations = dpath.util.search(
-        params["household"],
-        "*/*/*/*",
-        afilter=lambda t: t is None,
-        yielded=True,
-    )
 
-    for computation in requested_computations:
-        path = computation[0]
-        entity_plural, entity_id, variable_name, period = path.split("/")
-        result = simulation.calculate(variable_name, period)
+class TraceGraph:
+    """The calculations of a traced simulation, storing each variable and period once.
 
-    def trace_node_to_dict(node):
-        try:
-            value = [float(value) for value in node.value]
-        except:
-            try:
-                value = [str(value) for value in node.value]
-            except:
-                value = None
-        return {
-            "name": node.name,
-            "value": value,
-            "children": [trace_node_to_dict(child) for child in node.children],
-        }
+    A variable is traced under every variable using it, but only computed (with children) the first time: later occurrences are served from the simulation's cache.
+    """
+
+    def __init__(self, trees: List[TraceNode]):
+        """Builds the graph from the trees of a full tracer.
+
+        Args:
+            trees (List[TraceNode]): The trace trees.
+        """
+        self.names: List[str] = []
+        """The variable name of each node."""
+
+        self.periods: List[str] = []
+        """The period of each node."""
+
+        self.values: List[Optional[list]] = []
+        """The value of each node."""
+
+        self.children: List[List[int]] = []
+        """The nodes used by each node, in order of use."""
+
+        self.roots: List[int] = []
+        """The nodes requested from the simulation."""
+
+        node_ids: Dict[tuple, int] = {}
+        # Pre-order traversal, so that the first occurrence of a node is the
+        # one computing it.
+        stack = [(tree, None) for tree in reversed(trees)]
+        while stack:
+            trace_node, parent = stack.pop()
+            key = (
+                trace_node.name,
+                str(trace_node.period),
+                trace_node.branch_name,
+            )
+            node = node_ids.get(key)
+            if node is None:
+                node = node_ids[key] = len(self.names)
+                self.names.append(trace_node.name)
+                self.periods.append(str(trace_node.period))
+                self.values.append(get_trace_value(trace_node.value))
+                self.children.append([])
+                stack.extend(
+                    (child, node) for child in reversed(trace_node.children)
+                )
+            if parent is None:
+                self.roots.append(node)
+            else:
+                self.children[parent].append(node)
+
+    def computation_trees(self) -> List[dict]:
+        """Gets the trace trees in their original nested form, in which nodes are expanded on their first occurrence only.
 
-    return {
-        "computation_trees": [
-            trace_node_to_dict(tree) for tree in simulation.tracer.trees
+        Returns:
+            List[dict]: The trees.
+        """
+        trees = []
+        expanded = set()
+        stack = [(root, trees) for root in reversed(self.roots)]
+        while stack:
+            node, siblings = stack.pop()
+            children = []
+            siblings.append(
+                {
+                    "name": self.names[node],
+                    "value": self.values[node],
+                    "children": children,
+                }
+            )
+            if node not in expanded:
+                expanded.add(node)
+                stack.extend(
+                    (child, children)
+                    for child in reversed(self.children[node])
+                )
+        return trees
+
+    def to_dag(
+        self,
+        max_depth: int = None,
+        max_values: int = None,
+        node: int = None,
+    ) -> dict:
+        """Gets the graph in a compact form: a table of nodes (with their IDs, names, periods, values and numbers of children) and the edges between them as pairs of node IDs.
+
+        Limiting the depth allows a graph to be explored level by level, requesting the subgraph of a node when it is expanded.
+
+        Args:
+            max_depth (int, optional): The maximum number of edges between a starting node and any node included. Defaults to no limit.
+            max_values (int, optional): The maximum number of values included per node. Defaults to no limit.
+            node (int, optional): The ID of the node to start from. Defaults to the requested variables.
+
+        Raises:
+            ValueError: If the node doesn't exist.
+
+        Returns:
+            dict: The graph.
+        """
+        if node is None:
+            roots = list(dict.fromkeys(self.roots))
+        elif 0 <= node < len(self.names):
+            roots = [node]
+        else:
+            raise ValueError(f"No computation graph node with ID {node}.")
+        # Breadth-first, so that each node is found at its smallest depth.
+        depths = {root: 0 for root in roots}
+        queue = deque(depths)
+        while queue:
+            node = queue.popleft()
+            if max_depth is not None and depths[node] >= max_depth:
+                continue
+            for child in self.children[node]:
+                if child not in depths:
+                    depths[child] = depths[node] + 1
+                    queue.append(child)
+        nodes = sorted(depths)
+        children = {
+            node: list(dict.fromkeys(self.children[node])) for node in nodes
+        }
+        edges = [
+            [node, child]
+            for node in nodes
+            if max_depth is None or depths[node] < max_depth
+            for child in children[node]
         ]
-    }
+        values = [self.values[node] for node in nodes]
+        return dict(
+            nodes=dict(
+                id=nodes,
+                name=[self.names[node] for node in nodes],
+                period=[self.periods[node] for node in nodes],
+                value=[
+                    value[:max_values]
+                    if value is not None and max_values is not None
+                    else value
+                    for value in values
+                ],
+                size=[
+                    len(value) if value is not None else 0 for value in values
+                ],
+                children=[len(children[node]) for node in nodes],
+            ),
+            edges=edges,
+            roots=roots,
+        )
+
+    def dependencies(self) -> List[str]:
+        """Gets the names of all variables involved."""
+        return list(dict.fromkeys(self.names))
+
+    def leaf_nodes(self) -> List[str]:
+        """Gets the names of the variables involved which don't depend on other variables, each once, in order of first use.
+
+        Unlike the nested trees, in which a variable served from the simulation's cache is traced without children, a variable computed from others is never a leaf (e.g. income tax used by both net income and benefits).
+        """
+        return list(
+            dict.fromkeys(
+                name
+                for name, children in zip(self.names, self.children)
+                if not children
+            )
+        )
+
+
+def get_trace_graph(simulation: Simulation, household: dict) -> TraceGraph:
+    """Calculates the variables requested in a household situation with tracing enabled.
+
+    Args:
+        simulation (Simulation): The simulation of the household.
+        household (dict): The household situation.
+
+    Returns:
+        TraceGraph: The trace graph.
+    """
+    simulation.trace = True
+    simulation.tracer = FullTracer()
+    for _, _, variable_name, period in get_requested_computations(household):
+        simulation.calculate(variable_name, period)
+    return TraceGraph(simulation.tracer.trees)
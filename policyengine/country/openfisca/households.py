@@ -0,0 +1,220 @@
+"""
+Batches of household situations, merged into a single situation so that a batch of households needs only one simulation.
+"""
+from typing import Dict, Iterable, List, Tuple, Union
+import dpath
+import numpy as np
+from policyengine_core.model_api import Enum
+from policyengine_core.simulations import Simulation
+from policyengine_core.taxbenefitsystems import TaxBenefitSystem
+from policyengine_core.variables import Variable
+
+
+def get_batch_id(index: int, entity_id: str) -> str:
+    """Gets the ID of an entity in a merged batch of households.
+
+    Args:
+        index (int): The position of the household in the batch.
+        entity_id (str): The ID of the entity in its household.
+
+    Returns:
+        str: The ID in the merged situation.
+    """
+    return f"{index}-{entity_id}"
+
+
+def get_batch_members(index: int, members: Union[str, List[str]]) -> List[str]:
+    """Gets the IDs of the members of a role in a merged batch of households.
+
+    Args:
+        index (int): The position of the household in the batch.
+        members (Union[str, List[str]]): The IDs of the members in their household. Roles with one member may give it without a list.
+
+    Returns:
+        List[str]: The IDs in the merged situation.
+    """
+    if isinstance(members, str):
+        members = [members]
+    return [get_batch_id(index, member) for member in members]
+
+
+def merge_households(households: List[dict], system: TaxBenefitSystem) -> dict:
+    """Merges household situations into one situation, prefixing entity IDs with the position of their household.
+
+    Households which don't define a group entity get their own default instance of it (rather than sharing one across the batch).
+
+    Args:
+        households (List[dict]): The household situations.
+        system (TaxBenefitSystem): The tax-benefit system.
+
+    Raises:
+        ValueError: If a household has axes or unknown entities.
+
+    Returns:
+        dict: The merged situation.
+    """
+    merged = {entity.plural: {} for entity in system.entities}
+    person_plural = system.person_entity.plural
+    for i, household in enumerate(households):
+        if "axes" in household:
+            raise ValueError("Households in a batch cannot have axes.")
+        unknown_entities = set(household) - set(merged)
+        if unknown_entities:
+            raise ValueError(
+                f"Unknown entities in household {i}: "
+                + ", ".join(sorted(unknown_entities))
+            )
+        for entity in system.entities:
+            instances = household.get(entity.plural)
+            if entity.is_person:
+                role_keys = set()
+            else:
+                role_keys = {
+                    role.plural or role.key for role in entity.flattened_roles
+                }
+                if instances is None:
+                    # Matches the default instance of a single simulation.
+                    first_role = entity.flattened_roles[0]
+                    instances = {
+                        entity.key: {
+                            first_role.plural
+                            or first_role.key: list(
+                                household.get(person_plural, {})
+                            )
+                        }
+                    }
+            for entity_id, instance in (instances or {}).items():
+                merged[entity.plural][get_batch_id(i, entity_id)] = {
+                    key: get_batch_members(i, value)
+                    if key in role_keys
+                    else value
+                    for key, value in instance.items()
+                }
+    return merged
+
+
+def get_requested_computations(
+    household: dict,
+) -> Iterable[Tuple[str, str, str, str]]:
+    """Finds the variables requested in a household situation (those with null values).
+
+    Args:
+        household (dict): The household situation.
+
+    Returns:
+        Iterable[Tuple[str, str, str, str]]: The entity plural, entity ID, variable name and period of each computation.
+    """
+    for path, _ in dpath.util.search(
+        household,
+        "*/*/*/*",
+        afilter=lambda t: t is None,
+        yielded=True,
+    ):
+        yield tuple(path.split("/"))
+
+
+def get_entity_values(
+    variable: Variable, result: np.ndarray, indices: np.ndarray
+) -> list:
+    """Converts the results of a variable for some entities to JSON-serialisable values.
+
+    Args:
+        variable (Variable): The variable.
+        result (np.ndarray): The results for every entity.
+        indices (np.ndarray): The positions of the entities.
+
+    Returns:
+        list: The values, in the order of `indices`.
+    """
+    if variable.value_type == Enum:
+        return result.decode_to_str()[indices].tolist()
+    values = result[indices]
+    if variable.value_type == float:
+        # Round-trip through text, so that values are written at the
+        # precision they were computed at (e.g. 0.1 for a float32 0.1).
+        return values.astype(str).astype(float).tolist()
+    if variable.value_type == str:
+        return values.astype(str).tolist()
+    return values.tolist()
+
+
+def fill_requested_computations(
+    simulation: Simulation,
+    computations: Iterable[Tuple[dict, Tuple[str, str, str, str], str]],
+):
+    """Calculates requested variables and writes them into their household situations.
+
+    Computations are grouped by variable and period, so that each is calculated and converted once, and written in a single pass.
+
+    Args:
+        simulation (Simulation): The simulation.
+        computations (Iterable[Tuple[dict, Tuple[str, str, str, str], str]]): The household, the requested computation (see `get_requested_computations`) and the ID of the entity in the simulation, for each computation.
+    """
+    system = simulation.tax_benefit_system
+    id_indices: Dict[str, Dict[str, int]] = {}
+    # (variable, period) -> list of (household, computation, entity index).
+    requests: Dict[Tuple[str, str], list] = {}
+    for household, computation, simulation_id in computations:
+        entity_plural, _, variable_name, period = computation
+        if entity_plural not in id_indices:
+            population = simulation.get_population(entity_plural)
+            id_indices[entity_plural] = {
+                entity_id: index
+                for index, entity_id in enumerate(population.ids)
+            }
+        index = id_indices[entity_plural].get(simulation_id)
+        requests.setdefault((variable_name, period), []).append(
+            (household, computation, index)
+        )
+    for (variable_name, period), entities in requests.items():
+        result = simulation.calculate(variable_name, period)
+        found = [
+            (household, computation, index)
+            for household, computation, index in entities
+            if index is not None
+        ]
+        values = get_entity_values(
+            system.get_variable(variable_name),
+            result,
+            np.array([index for _, _, index in found], dtype=int),
+        )
+        for (household, computation, _), value in zip(found, values):
+            if isinstance(value, list) and len(value) > 2_000:
+                # Bug fix, unclear of the root cause
+                value = {period: value[-1]}
+            entity_plural, entity_id, _, _ = computation
+            household[entity_plural][entity_id][variable_name][period] = value
+        if len(found) < len(entities):
+            # In cases of axes, the entity ID won't resolve (e.g. you
+            # requested a value for person, but instead there's person1,
+            # person2, ...), so return the values for every entity.
+            all_values = result.astype(float).tolist()
+            for household, computation, index in entities:
+                if index is None:
+                    entity_plural, entity_id, _, _ = computation
+                    household[entity_plural][entity_id][variable_name][
+                        period
+                    ] = all_values
+
+
+def calculate_households(
+    simulation: Simulation, households: List[dict]
+) -> List[dict]:
+    """Fills in the variables requested in each household of a batch, from a simulation of the merged batch.
+
+    Args:
+        simulation (Simulation): The simulation of the merged households.
+        households (List[dict]): The household situations.
+
+    Returns:
+        List[dict]: The households, with requested variables filled in.
+    """
+    fill_requested_computations(
+        simulation,
+        (
+            (household, computation, get_batch_id(i, computation[1]))
+            for i, household in enumerate(households)
+            for computation in list(get_requested_computations(household))
+        ),
+    )
+    return households
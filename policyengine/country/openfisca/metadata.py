@@ -0,0 +1,117 @@
+"""
+Persistent bundles of the entity, variable and parameter metadata served by the API, pre-encoded as JSON.
+"""
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict
+from policyengine_core.reforms import Reform
+from policyengine.country.openfisca.snapshots import (
+    get_package_version,
+    get_reform_hash,
+    remove_stale_versions,
+)
+
+METADATA_TYPES = ("entities", "variables", "parameters")
+
+
+def _to_json(value: Any) -> Any:
+    # NumPy scalars and arrays.
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def encode_metadata(metadata: dict) -> bytes:
+    """Encodes metadata as a JSON response body.
+
+    Args:
+        metadata (dict): The metadata.
+
+    Returns:
+        bytes: The JSON.
+    """
+    return json.dumps(
+        metadata, sort_keys=True, separators=(",", ":"), default=_to_json
+    ).encode()
+
+
+def get_metadata_bundle_key(
+    country_model: ModuleType, default_reform: Reform
+) -> str:
+    """Gets the key identifying a metadata bundle.
+
+    Parameter metadata includes current values, so the key also includes today's date. Saving a bundle removes those from earlier dates.
+
+    Args:
+        country_model (ModuleType): The OpenFisca country model.
+        default_reform (Reform): The reform applied to the country model before use.
+
+    Returns:
+        str: The key.
+    """
+    reform_hash = get_reform_hash(default_reform)
+    model_name = country_model.__name__
+    model_version = get_package_version(model_name)
+    return f"{model_name}-{model_version}-{reform_hash}"
+
+
+class MetadataBundle:
+    """The encoded metadata of a country, stored as one JSON file per metadata type."""
+
+    def __init__(self, folder: Path, key: str):
+        """Initialises the bundle.
+
+        Args:
+            folder (Path): The folder holding all bundles.
+            key (str): The key identifying this bundle.
+        """
+        self.path = Path(folder) / key
+
+    def exists(self) -> bool:
+        """Whether the bundle has been written to disk."""
+        return all(
+            (self.path / f"{name}.json").exists() for name in METADATA_TYPES
+        )
+
+    def save(self, encoded_metadata: Dict[str, bytes]) -> None:
+        """Writes encoded metadata to disk, via a temporary folder so that concurrent workers never read a partial bundle.
+
+        Args:
+            encoded_metadata (Dict[str, bytes]): The JSON of each metadata type.
+        """
+        if self.exists():
+            return
+        staging_path = self.path.with_name(
+            f"{self.path.name}.staging-{os.getpid()}"
+        )
+        try:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            staging_path.mkdir(parents=True)
+            for name in METADATA_TYPES:
+                (staging_path / f"{name}.json").write_bytes(
+                    encoded_metadata[name]
+                )
+            os.rename(staging_path, self.path)
+            logging.info(f"Saved metadata bundle to {self.path}.")
+        except OSError as e:
+            # Another worker saved the same bundle first, or storage is
+            # read-only.
+            logging.warning(f"Could not save metadata bundle: {e}")
+            shutil.rmtree(staging_path, ignore_errors=True)
+            return
+        remove_stale_versions(self.path)
+
+    def load(self) -> Dict[str, bytes]:
+        """Reads the encoded metadata.
+
+        Returns:
+            Dict[str, bytes]: The JSON of each metadata type.
+        """
+        return {
+            name: (self.path / f"{name}.json").read_bytes()
+            for name in METADATA_TYPES
+        }
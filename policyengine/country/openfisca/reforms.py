@@ -1,7 +1,8 @@
+import copy
 from datetime import datetime
 import logging
 from pathlib import Path
-from typing import Type
+from typing import List, Type
 from policyengine_core.parameters.helpers import load_parameter_file
 from policyengine_core.parameters import (
     ParameterNode,
@@ -121,6 +122,93 @@ def parametric(
     )
 
 
+def add_modify_parameters(system: TaxBenefitSystem):
+    """Adds a `modify_parameters` method to a system, for systems whose class doesn't define it.
+
+    Args:
+        system (TaxBenefitSystem): The system.
+    """
+
+    def modify_parameters(self, modifier):
+        self.parameters = modifier(self.parameters)
+
+    system.modify_parameters = modify_parameters.__get__(system)
+
+
+def copy_parameter_path(root: ParameterNode, parameter: str) -> ParameterNode:
+    """Copies the nodes on the path from the root of a parameter tree to a parameter, so that the parameter can be modified without affecting other trees sharing the rest of the nodes.
+
+    Args:
+        root (ParameterNode): The root of the tree.
+        parameter (str): The name of the parameter, e.g. tax.brackets[3].rate.
+
+    Returns:
+        ParameterNode: The root of the new tree.
+    """
+    root = copy.copy(root)
+    node = root
+    for name in parameter.split("."):
+        index = None
+        if "[" in name:
+            name, index = name.split("[")
+            index = int(index[:-1])
+        child = node.children[name]
+        child = (
+            child.clone() if isinstance(child, Parameter) else copy.copy(child)
+        )
+        node.children = dict(node.children)
+        node.children[name] = child
+        setattr(node, name, child)
+        child.parent = node
+        if index is not None:
+            child.brackets = list(child.brackets)
+            bracket = copy.copy(child.brackets[index])
+            child.brackets[index] = bracket
+            child = bracket
+        node = child
+    return root
+
+
+def clone_system(
+    system: TaxBenefitSystem, parameters: List[str]
+) -> TaxBenefitSystem:
+    """Creates a copy of a system whose variables and given parameters can be modified without affecting the original.
+
+    Unlike `TaxBenefitSystem.clone`, only the parameter nodes on the paths to the given parameters are copied, and variables are shared until replaced.
+
+    Args:
+        system (TaxBenefitSystem): The system to copy.
+        parameters (List[str]): The names of the parameters to copy, e.g. tax.brackets[3].rate.
+
+    Returns:
+        TaxBenefitSystem: The copy.
+    """
+    clone = copy.copy(system)
+    if "modify_parameters" in clone.__dict__:
+        # Rebind the added method to the copy.
+        add_modify_parameters(clone)
+    clone.variables = dict(system.variables)
+    clone._parameters_at_instant_cache = {}
+    # Entities look variables up through their system, so copy them as the
+    # system's initialiser does, rather than rebinding the shared ones.
+    clone.entities = [copy.copy(entity) for entity in system.entities]
+    clone.person_entity = [
+        entity for entity in clone.entities if entity.is_person
+    ][0]
+    clone.group_entities = [
+        entity for entity in clone.entities if not entity.is_person
+    ]
+    for entity in clone.entities:
+        entity.set_tax_benefit_system(clone)
+    for parameter in parameters:
+        try:
+            clone.parameters = copy_parameter_path(clone.parameters, parameter)
+        except (KeyError, ValueError, AttributeError, IndexError):
+            # Unknown parameters are reported when the policy is applied.
+            pass
+    return clone
+
+
 def apply_reform(reform: tuple, system: TaxBenefitSystem) -> TaxBenefitSystem:
     """Applies a reform to a system.
 
@@ -132,11 +220,7 @@ def apply_reform(reform: tuple, system: TaxBenefitSystem) -> TaxBenefitSystem:
         TaxBenefitSystem: The system with the reform applied.
     """
     if not hasattr(system, "modify_parameters"):
-
-        def modify_parameters(self, modifier):
-            self.parameters = modifier(self.parameters)
-
-        system.modify_parameters = modify_parameters.__get__(system)
+        add_modify_parameters(system)
     if isinstance(reform, tuple):
         for subreform in reform:
             system = apply_reform(subreform, system)
@@ -145,13 +229,43 @@ def apply_reform(reform: tuple, system: TaxBenefitSystem) -> TaxBenefitSystem:
     return system
 
 
+HOUSEHOLD_VIEW_PARAMETERS = [
+    "max_depth",
+    "max_values",
+    "node",
+]
+"""Parameters of household endpoints choosing how results are presented, rather than what is calculated."""
+
 IGNORED_POLICY_PARAMETERS = [
     "household",
+    "households",
     "baseline_country_specific",
     "country_specific",
     "baseline_state_specific",
     "state_specific",
-]
+] + HOUSEHOLD_VIEW_PARAMETERS
+
+POLICY_DATE_PARAMETERS = ("policy_date", "baseline_policy_date")
+
+
+def normalise_policy_date(date) -> str:
+    """Writes a policy date as YYYYMMDD.
+
+    Args:
+        date: The date, e.g. 20220101, "20220101" or "2022-01-01".
+
+    Returns:
+        str: The date in the form YYYYMMDD.
+    """
+    return str(date).replace("-", "")
+
+
+def same_parameter_value(x, y) -> bool:
+    """Whether two parameter values are the same, treating numbers and numeric strings (including "inf") alike."""
+    try:
+        return float(x) == float(y)
+    except (TypeError, ValueError):
+        return x == y
 
 
 class PolicyReform:
@@ -168,6 +282,11 @@ class PolicyReform:
             for key, value in parameters.items()
             if key not in IGNORED_POLICY_PARAMETERS
         }
+        self.ignored_parameters = {
+            key: value
+            for key, value in parameters.items()
+            if key in IGNORED_POLICY_PARAMETERS
+        }
         self.policyengine_parameters = policyengine_parameters
         self.default_reform = default_reform
         self._sanitise_parameters()
@@ -199,6 +318,44 @@ class PolicyReform:
             except:
                 pass
 
+    @property
+    def canonical_parameters(self) -> dict:
+        """The request parameters in a canonical form, so that requests for the same baseline and reform policies have the same parameters.
+
+        Values are sanitised, policy dates are written as YYYYMMDD, and parameters set to the value they would have anyway are removed. Parameters which don't describe policy are left unchanged.
+        """
+        parameters = dict(self.parameters)
+        for key in POLICY_DATE_PARAMETERS:
+            if key in parameters:
+                parameters[key] = normalise_policy_date(parameters[key])
+        if not any(key in parameters for key in POLICY_DATE_PARAMETERS):
+            # Current values are only known without a policy date.
+            current_values = {
+                key: metadata.get("value")
+                for key, metadata in self.policyengine_parameters.items()
+            }
+            for key in list(parameters):
+                if key.startswith("baseline_") or key not in current_values:
+                    continue
+                baseline_value = parameters.get(
+                    "baseline_" + key, current_values[key]
+                )
+                if baseline_value is not None and same_parameter_value(
+                    parameters[key], baseline_value
+                ):
+                    del parameters[key]
+            for key in list(parameters):
+                name = key.replace("baseline_", "", 1)
+                if (
+                    key.startswith("baseline_")
+                    and current_values.get(name) is not None
+                    and same_parameter_value(
+                        parameters[key], current_values[name]
+                    )
+                ):
+                    del parameters[key]
+        return {**parameters, **self.ignored_parameters}
+
     @property
     def edits_baseline(self) -> bool:
         """Returns whether the reform edits the baseline policy."""
@@ -282,6 +439,28 @@ class Policy:
                 )
             else:
                 system = apply_reform(self.default_reform, system)
+        return self.apply_parameters(system)
+
+    @property
+    def modified_parameters(self) -> List[str]:
+        """The names of the OpenFisca parameters which applying the policy (after any default reform) updates."""
+        names = []
+        for key in self.parameters:
+            metadata = self.policyengine_parameters.get(key)
+            if metadata is not None and metadata["unit"] != "abolition":
+                names.append(metadata["parameter"])
+        for key in self.baseline_parameters:
+            metadata = self.policyengine_parameters.get(key)
+            if metadata is not None:
+                names.append("baseline." + metadata.get("parameter"))
+        return names
+
+    def apply_parameters(self, system: TaxBenefitSystem) -> TaxBenefitSystem:
+        """Applies the policy's parameter changes and abolitions to a system, without the default reform.
+
+        Args:
+            system (TaxBenefitSystem): The system to apply them to.
+        """
         for key, value in self.parameters.items():
             if key == "policy_date":
                 continue
@@ -314,3 +493,4 @@ class Policy:
             except:
                 pass
                 # logging.warn(f"Could not apply {parameter_name}={value}")
+        return system
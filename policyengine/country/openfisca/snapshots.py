@@ -0,0 +1,188 @@
+"""
+Persistent on-disk snapshots of computed baseline microsimulation arrays.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from types import ModuleType
+import numpy as np
+import pkg_resources
+from policyengine_core.enums import EnumArray
+from policyengine_core.periods import period as to_period
+from policyengine_core.reforms import Reform
+from policyengine_core.simulations import Simulation
+from policyengine.country.openfisca.parameters import NOW
+
+
+def get_package_version(package: str) -> str:
+    """Gets the installed version of a package, or "unknown" if it isn't installed as a distribution."""
+    try:
+        return pkg_resources.get_distribution(package).version
+    except pkg_resources.DistributionNotFound:
+        return "unknown"
+
+
+def remove_stale_versions(path: Path) -> None:
+    """Removes the other versions of a folder keyed by country model (e.g. a baseline snapshot): the folders beside it whose keys start with the same model name.
+
+    Keys include today's date, so without this a new version would be kept every day.
+
+    Args:
+        path (Path): The folder of the current version.
+    """
+    model_name = path.name.split("-")[0]
+    for other_path in path.parent.glob(f"{model_name}-*"):
+        if other_path.name == path.name or ".staging-" in other_path.name:
+            # Folders being written are renamed or removed by their writer.
+            continue
+        shutil.rmtree(other_path, ignore_errors=True)
+        logging.info(f"Removed stale folder {other_path}.")
+
+
+def get_reform_fingerprint(reform: tuple) -> str:
+    """Identifies a (possibly nested) reform by the qualified names of its parts.
+
+    Args:
+        reform (tuple): The reform.
+
+    Returns:
+        str: The names of the reform's parts, in order of application.
+    """
+    if reform is None:
+        return ""
+    if isinstance(reform, tuple):
+        return ",".join(map(get_reform_fingerprint, reform))
+    return f"{reform.__module__}.{reform.__qualname__}"
+
+
+def get_reform_hash(default_reform: Reform) -> str:
+    """Hashes a default reform together with the PolicyEngine version and today's date, since the default reforms set parameters to their current values.
+
+    Args:
+        default_reform (Reform): The reform applied to the country model before use.
+
+    Returns:
+        str: The hash.
+    """
+    return hashlib.blake2b(
+        "|".join(
+            (
+                get_reform_fingerprint(default_reform),
+                get_package_version("policyengine"),
+                NOW,
+            )
+        ).encode(),
+        digest_size=8,
+    ).hexdigest()
+
+
+def get_baseline_snapshot_key(
+    country_model: ModuleType, dataset_year: int, default_reform: Reform
+) -> str:
+    """Gets the key identifying a baseline snapshot.
+
+    The default reforms set parameters to their current values, so the key also includes today's date.
+
+    Args:
+        country_model (ModuleType): The OpenFisca country model.
+        dataset_year (int): The year of the microdata.
+        default_reform (Reform): The reform applied to the country model before use.
+
+    Returns:
+        str: The key.
+    """
+    reform_hash = get_reform_hash(default_reform)
+    model_name = country_model.__name__
+    model_version = get_package_version(model_name)
+    return f"{model_name}-{model_version}-{dataset_year}-{reform_hash}"
+
+
+class BaselineSnapshot:
+    """Computed variable arrays of a baseline simulation, stored as one memory-mappable .npy file per variable and period."""
+
+    def __init__(self, folder: Path, key: str):
+        """Initialises the snapshot.
+
+        Args:
+            folder (Path): The folder holding all snapshots.
+            key (str): The key identifying this snapshot.
+        """
+        self.path = Path(folder) / key
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / "manifest.json"
+
+    def exists(self) -> bool:
+        """Whether the snapshot has been written to disk."""
+        return self.manifest_path.exists()
+
+    def save(self, simulation: Simulation) -> None:
+        """Writes every known array of a simulation to disk.
+
+        The snapshot is written to a temporary folder and then renamed, so that concurrent workers never read a partial snapshot.
+
+        Args:
+            simulation (Simulation): The simulation to store.
+        """
+        if self.exists():
+            return
+        staging_path = self.path.with_name(
+            f"{self.path.name}.staging-{os.getpid()}"
+        )
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path.mkdir(parents=True)
+        manifest = []
+        for variable in list(simulation.tax_benefit_system.variables):
+            holder = simulation.get_holder(variable)
+            for period in list(holder.get_known_periods()):
+                array = holder.get_array(period)
+                if array is None or array.dtype == object:
+                    # Arrays of Python objects can't be memory-mapped.
+                    continue
+                file_name = f"{len(manifest)}.npy"
+                np.save(staging_path / file_name, np.asarray(array))
+                manifest.append(
+                    dict(
+                        variable=variable,
+                        period=str(period),
+                        file=file_name,
+                        enum=isinstance(array, EnumArray),
+                    )
+                )
+        with open(staging_path / "manifest.json", "w") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(staging_path, self.path)
+            logging.info(f"Saved baseline snapshot to {self.path}.")
+        except OSError:
+            # Another worker saved the same snapshot first.
+            shutil.rmtree(staging_path, ignore_errors=True)
+            return
+        remove_stale_versions(self.path)
+
+    def load(self, simulation: Simulation) -> None:
+        """Loads the stored arrays into the cache of a simulation.
+
+        Arrays are memory-mapped copy-on-write, so workers share the pages on disk and any in-place changes stay private to the process.
+
+        Args:
+            simulation (Simulation): The simulation to populate.
+        """
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        variables = simulation.tax_benefit_system.variables
+        for entry in manifest:
+            variable = variables.get(entry["variable"])
+            if variable is None:
+                continue
+            array = np.load(self.path / entry["file"], mmap_mode="c")
+            if entry["enum"]:
+                array = EnumArray(array, variable.possible_values)
+            simulation.get_holder(entry["variable"]).put_in_cache(
+                array, to_period(entry["period"])
+            )
+        logging.info(f"Loaded baseline snapshot from {self.path}.")
@@ -1,7 +1,6 @@
-from typing import Callable, Type
-import numpy as np
-from openfisca_tools import IndividualSim
+from typing import Callable, List, Tuple, Type
 from policyengine.country.results_config import PolicyEngineResultsConfig
+from policyengine.impact.household.earnings_sweep import EarningsSweep
 from policyengine.impact.utils import *
 import plotly.express as px
 import pandas as pd
@@ -32,42 +31,8 @@ DEBUG_VARIABLES = [
 ]
 
 
-def cliff_gaps(
-    sim: IndividualSim, config: Type[PolicyEngineResultsConfig]
-) -> list:
-    """Identifies the employment income boundaries of net income cliffs.
-
-    :param sim: Simulation.
-    :type baseline: IndividualSim
-    :param config: Configuration.
-    :type config: Type[PolicyEngineResultsConfig]
-    :return: List of lists with each containing the start and end of a cliff.
-    :rtype: list
-    """
-    employment_income = sim.calc(config.total_income_variable)[0]
-    net_income = sim.calc(config.household_net_income_variable)[0]
-    diffs = np.diff(net_income, append=np.inf)
-    cliffs = np.where(diffs < 0)[0]
-    start = []
-    end = []
-    for cliff in cliffs:
-        employment_income_before_cliff = employment_income[cliff]
-        # Skip if embedded in a larger cliff.
-        if len(end) > 0:
-            if employment_income_before_cliff < end[-1]:
-                continue
-        net_income_before_cliff = net_income[cliff]
-        ix_first_exceed_cliff = np.argmax(net_income > net_income_before_cliff)
-        employment_income_after_cliff = employment_income[
-            ix_first_exceed_cliff
-        ]
-        start.append(employment_income_before_cliff)
-        end.append(employment_income_after_cliff)
-    return list(zip(start, end))
-
-
 def shade_cliffs(
-    sim: IndividualSim,
+    cliffs: List[Tuple[float, float]],
     config: Type[PolicyEngineResultsConfig],
     fig: go.Figure,
     fillcolor: str,
@@ -75,8 +40,8 @@ def shade_cliffs(
 ) -> None:
     """Shades the cliffs in a net income or MTR chart.
 
-    :param sim: Simulation.
-    :type baseline: IndividualSim
+    :param cliffs: The start and end of each cliff.
+    :type cliffs: List[Tuple[float, float]]
     :param config: Configuration.
     :type config: Type[PolicyEngineResultsConfig]
     :param fig: Plotly figure.
@@ -88,7 +53,7 @@ def shade_cliffs(
     :return: None
     :rtype: None
     """
-    for cliff in cliff_gaps(sim, config):
+    for cliff in cliffs:
         start = cliff[0]
         end = cliff[1]
         text = (
@@ -116,26 +81,24 @@ def shade_cliffs(
 
 
 def budget_chart(
-    baseline: IndividualSim,
-    reformed: IndividualSim,
+    sweep: EarningsSweep,
     show_difference: bool,
     config: Type[PolicyEngineResultsConfig],
-    has_reform: bool = True,
     original_total_income: float = None,
     original_tax: float = None,
     original_benefits: float = None,
 ) -> str:
     """Produces line chart with employment income on the x axis and net income
     on the y axis, for baseline and reform simulations.
-    :param baseline: Baseline simulation.
-    :type baseline: IndividualSim
-    :param reformed: Reform simulation.
-    :type reformed: IndividualSim
+    :param sweep: Results of varying earnings in the baseline and reform
+        simulations.
+    :type sweep: EarningsSweep
     :return: Representation of the budget plotly chart as a JSON string.
     :rtype: str
     """
+    has_reform = sweep.has_reform
     variable_values = {}
-    total_income = baseline.calc(config.total_income_variable).sum(axis=0)
+    total_income = sweep.series(config.total_income_variable)
     # Find the x-point on the chart which is the current situation
     i = (total_income < original_total_income).sum()
     for explaining_variable in (
@@ -143,23 +106,19 @@ def budget_chart(
         config.tax_variable,
         config.benefit_variable,
     ):
+        variable_values[explaining_variable + "_baseline"] = sweep.series(
+            explaining_variable
+        )
         if has_reform:
-            variable_values[explaining_variable + "_baseline"] = baseline.calc(
-                explaining_variable
-            ).sum(axis=0)
-            variable_values[explaining_variable + "_reform"] = reformed.calc(
-                explaining_variable
-            ).sum(axis=0)
-        else:
-            variable_values[explaining_variable + "_baseline"] = baseline.calc(
-                explaining_variable
-            ).sum(axis=0)
+            variable_values[explaining_variable + "_reform"] = sweep.series(
+                explaining_variable, reform=True
+            )
     explainer_names = []
     if DEBUG_MODE:
         for variable in DEBUG_VARIABLES:
-            baseline_values = baseline.calc(variable).sum(axis=0)
+            baseline_values = sweep.series(variable)
             name = (
-                baseline.simulation.tax_benefit_system.variables[
+                sweep.baseline.simulation.tax_benefit_system.variables[
                     variable
                 ].label
                 or variable
@@ -167,7 +126,7 @@ def budget_chart(
             explainer_names += [name]
             variable_values[name] = baseline_values
             if has_reform:
-                reform_values = reformed.calc(variable).sum(axis=0)
+                reform_values = sweep.series(variable, reform=True)
                 explainer_names[-1] += " (baseline)"
                 variable_values[name + " (baseline)"] = baseline_values
                 del variable_values[name]
@@ -175,18 +134,14 @@ def budget_chart(
                 variable_values[name + " (reform)"] = reform_values
     df = pd.DataFrame(
         {
-            "Total income": baseline.calc(config.total_income_variable).sum(
-                axis=0
-            ),
-            "Baseline": baseline.calc(
-                config.household_net_income_variable
-            ).sum(axis=0),
+            "Total income": total_income,
+            "Baseline": sweep.series(config.household_net_income_variable),
             **variable_values,
         }
     )
     if has_reform:
-        df["Reform"] = reformed.calc(config.household_net_income_variable).sum(
-            axis=0
+        df["Reform"] = sweep.series(
+            config.household_net_income_variable, reform=True
         )
     else:
         df["Reform"] = df.Baseline
@@ -236,9 +191,9 @@ def budget_chart(
     fig = go.Figure()
     # Shade baseline and reformed net income cliffs.
     ymax = df[y_fig].max().max() * 1.05  # Add a buffer.
-    shade_cliffs(baseline, config, fig, GRAY, ymax)
+    shade_cliffs(sweep.cliffs(), config, fig, GRAY, ymax)
     if has_reform:
-        shade_cliffs(reformed, config, fig, BLUE, ymax)
+        shade_cliffs(sweep.cliffs(reform=True), config, fig, BLUE, ymax)
     add_zero_line(fig)
     add_you_are_here(fig, df["Total income"][i])
     line_chart = px.line(
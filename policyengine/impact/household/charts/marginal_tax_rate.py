@@ -1,7 +1,7 @@
 from typing import Callable, Type
 import numpy as np
-from openfisca_tools import IndividualSim
 from policyengine.country.results_config import PolicyEngineResultsConfig
+from policyengine.impact.household.earnings_sweep import EarningsSweep
 from policyengine.impact.utils import *
 import plotly.express as px
 import pandas as pd
@@ -50,33 +50,29 @@ def get_mtr(x, y):
 
 
 def mtr_chart(
-    baseline: IndividualSim,
-    reformed: IndividualSim,
+    sweep: EarningsSweep,
     show_difference: bool,
     config: Type[PolicyEngineResultsConfig],
-    has_reform: bool = True,
     original_total_income: float = None,
 ) -> str:
     """Produces line chart with employment income on the x axis and marginal
     tax rate on the y axis, for baseline and reform simulations.
-    :param baseline: Baseline simulation.
-    :type baseline: IndividualSim
-    :param reformed: Reform simulation.
-    :type reformed: IndividualSim
+    :param sweep: Results of varying earnings in the baseline and reform
+        simulations.
+    :type sweep: EarningsSweep
     :return: Representation of the marginal tax rate plotly chart as a JSON
         string.
     :rtype: str
     """
-    earnings = baseline.calc(config.total_income_variable).sum(axis=0)
-    baseline_net = baseline.calc(config.household_net_income_variable).sum(
-        axis=0
-    )
+    has_reform = sweep.has_reform
+    earnings = sweep.series(config.total_income_variable)
+    baseline_net = sweep.series(config.household_net_income_variable)
     if has_reform:
-        reform_net = reformed.calc(config.household_net_income_variable).sum(
-            axis=0
+        reform_net = sweep.series(
+            config.household_net_income_variable, reform=True
         )
 
-    total_income = baseline.calc(config.total_income_variable).sum(axis=0)
+    total_income = earnings
     # Find the x-point on the chart which is the current situation
     i = (total_income < original_total_income).sum()
 
@@ -101,9 +97,9 @@ def mtr_chart(
             "benefits",
         ),
     ):
-        baseline_values = baseline.calc(explaining_variable).sum(axis=0)
+        baseline_values = sweep.series(explaining_variable)
         reform_values = (
-            reformed.calc(explaining_variable).sum(axis=0)
+            sweep.series(explaining_variable, reform=True)
             if has_reform
             else baseline_values
         )
@@ -124,11 +120,11 @@ def mtr_chart(
     if DEBUG_MODE:
         explainer_names = []
         for variable in DEBUG_VARIABLES:
-            baseline_values = baseline.calc(variable).sum(axis=0)
+            baseline_values = sweep.series(variable)
             multiplier = 1 if inverted else -1
             addition = -1 if inverted else 1
             name = (
-                baseline.simulation.tax_benefit_system.variables[
+                sweep.baseline.simulation.tax_benefit_system.variables[
                     variable
                 ].label
                 or variable
@@ -188,9 +184,9 @@ def mtr_chart(
     # Shade baseline and reformed net income cliffs.
     ymax = df[y_fig].max() * 1.05  # Add a buffer.
     fig = go.Figure()
-    shade_cliffs(baseline, config, fig, GRAY, ymax)
+    shade_cliffs(sweep.cliffs(), config, fig, GRAY, ymax)
     if has_reform:
-        shade_cliffs(reformed, config, fig, BLUE, ymax)
+        shade_cliffs(sweep.cliffs(reform=True), config, fig, BLUE, ymax)
     fig.add_traces(list(line_chart.select_traces()))
     add_you_are_here(fig, df.Earnings[i])
     add_zero_line(fig)
@@ -1,13 +1,21 @@
+from typing import Callable
 from policyengine_core.simulations import IndividualSim
 from policyengine.country.results_config import PolicyEngineResultsConfig
 from policyengine.impact.household.charts.budget import budget_chart
 from policyengine.impact.household.charts.marginal_tax_rate import mtr_chart
+from policyengine.impact.household.earnings_sweep import (
+    EarningsSweep,
+    get_sweep_arrays,
+    vary_earnings,
+)
 
 
 def earnings_impact(
     baseline: IndividualSim,
     reformed: IndividualSim,
     config: PolicyEngineResultsConfig,
+    adaptive: bool = False,
+    sweep_reform: Callable[[str, float], Callable[[], dict]] = None,
 ) -> dict:
     """Calculates the impact of a reform on household earnings.
 
@@ -15,6 +23,8 @@ def earnings_impact(
         baseline (IndividualSim): The baseline simulation.
         reformed (IndividualSim): The reformed simulation.
         config (PolicyEngineResultsConfig): The results configuration.
+        adaptive (bool, optional): Whether to vary earnings adaptively, simulating fewer points away from kinks and cliffs. Defaults to False.
+        sweep_reform (Callable[[str, float], Callable[[], dict]], optional): A function starting the variation of the reformed simulation elsewhere (e.g. in another process), given the earnings variable and maximum earnings, and returning a function which waits for its arrays (see `get_sweep_arrays`). Used in place of `reformed`, so that the baseline is varied at the same time.
     """
     employment_income = baseline.calc(config.employment_income_variable).sum()
     self_employment_income = baseline.calc(
@@ -30,53 +40,40 @@ def earnings_impact(
     benefits = baseline.calc(config.benefit_variable).sum()
     tax = baseline.calc(config.tax_variable).sum()
     vary_max = max(200_000, earnings * 1.5)
-    baseline.vary(
-        earnings_variable,
-        step=100,
-        max=vary_max,
-    )
-    if reformed is not None:
-        reformed.vary(
+    if sweep_reform is not None:
+        get_reformed_arrays = sweep_reform(earnings_variable, vary_max)
+        vary_earnings(
+            baseline,
+            None,
             earnings_variable,
+            vary_max,
+            config,
             step=100,
-            max=vary_max,
+            adaptive=adaptive,
         )
-    budget = budget_chart(
-        baseline,
-        reformed,
-        False,
-        config,
-        reformed is not None,
-        total_income,
-        tax,
-        benefits,
-    )
+        sweep = EarningsSweep.from_arrays(
+            config,
+            get_sweep_arrays(baseline, earnings_variable, config),
+            get_reformed_arrays(),
+        )
+    else:
+        vary_earnings(
+            baseline,
+            reformed,
+            earnings_variable,
+            vary_max,
+            config,
+            step=100,
+            adaptive=adaptive,
+        )
+        # Every chart reads the same series and cliffs, calculated once.
+        sweep = EarningsSweep(baseline, reformed, config)
+    budget = budget_chart(sweep, False, config, total_income, tax, benefits)
     budget_difference = budget_chart(
-        baseline,
-        reformed,
-        True,
-        config,
-        reformed is not None,
-        total_income,
-        tax,
-        benefits,
-    )
-    mtr = mtr_chart(
-        baseline,
-        reformed,
-        False,
-        config,
-        reformed is not None,
-        total_income,
-    )
-    mtr_difference = mtr_chart(
-        baseline,
-        reformed,
-        True,
-        config,
-        reformed is not None,
-        total_income,
+        sweep, True, config, total_income, tax, benefits
     )
+    mtr = mtr_chart(sweep, False, config, total_income)
+    mtr_difference = mtr_chart(sweep, True, config, total_income)
     return dict(
         budget_chart=budget,
         budget_difference_chart=budget_difference,
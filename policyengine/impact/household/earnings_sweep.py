@@ -0,0 +1,290 @@
+"""
+Variation of a household's earnings, either over an even grid or adaptively: a coarse grid refined only where the household's budget isn't linear in earnings.
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+from policyengine_core.simulations import IndividualSim
+from policyengine.country.results_config import PolicyEngineResultsConfig
+
+
+def vary_at(
+    sim: IndividualSim, variable: str, points: np.ndarray, period=None
+) -> None:
+    """Varies a variable of the first member of its entity over given values, which needn't be evenly spaced (unlike `IndividualSim.vary`).
+
+    Args:
+        sim (IndividualSim): The simulation.
+        variable (str): The variable to vary.
+        points (np.ndarray): The values.
+        period (optional): The period of the values. Defaults to the year of the simulation.
+    """
+    if sim.varying:
+        sim.reset_vary()
+    # Add an axis with the right number of points, then replace its values.
+    sim.vary(variable, min=0, max=len(points) - 1, step=1, period=period)
+    period = period or sim.year
+    values = np.array(sim.simulation.calculate(variable, period))
+    # Copies of the household are stored one after another.
+    values[:: values.size // len(points)] = points
+    sim.simulation.set_input(variable, period, values)
+
+
+def get_refined_points(
+    points: np.ndarray,
+    series: List[np.ndarray],
+    refinement: int = 10,
+    tolerance: float = 1e-4,
+) -> np.ndarray:
+    """Adds points to a grid around changes in the slope of any series (kinks and cliffs), so that the series are linear between consecutive points elsewhere.
+
+    Only changes in slope between grid points are found: a notch which starts and ends within one interval of the grid, leaving the slope either side unchanged, is missed.
+
+    Args:
+        points (np.ndarray): The grid.
+        series (List[np.ndarray]): The values of each series at the grid points.
+        refinement (int, optional): The number of intervals each refined interval is split into. Defaults to 10.
+        tolerance (float, optional): The smallest change in slope treated as a kink, beyond the error in slopes from rounding the series' values. Defaults to 1e-4.
+
+    Returns:
+        np.ndarray: The refined grid, in increasing order.
+    """
+    refine = np.zeros(len(points) - 1, dtype=bool)
+    for values in series:
+        values = np.asarray(values)
+        slopes = np.diff(values) / np.diff(points)
+        # Each value is rounded by up to half a unit in the last place, so
+        # the difference of two slopes is out by up to four times as much
+        # over the narrowest interval.
+        precision = np.finfo(np.result_type(values.dtype, np.float32)).eps
+        rounding_error = (
+            4 * precision * np.abs(values).max() / np.diff(points).min()
+        )
+        slope_changes = np.abs(np.diff(slopes)) > tolerance + rounding_error
+        # A kink lies in one of the intervals either side of the change.
+        refine[:-1] |= slope_changes
+        refine[1:] |= slope_changes
+    refined_points = [points] + [
+        np.linspace(points[i], points[i + 1], refinement + 1)[1:-1]
+        for i in np.where(refine)[0]
+    ]
+    return np.unique(np.concatenate(refined_points))
+
+
+def vary_earnings(
+    baseline: IndividualSim,
+    reformed: IndividualSim,
+    earnings_variable: str,
+    vary_max: float,
+    config: PolicyEngineResultsConfig,
+    step: float = 100,
+    adaptive: bool = False,
+    coarse_step: float = 1_000,
+) -> None:
+    """Varies the earnings of a household in the baseline and reformed simulations, over the same points.
+
+    Adaptive variation simulates a coarse grid first, then adds points at the resolution of the fine grid only where net income, tax or benefits change slope in either simulation. Charts then match those over the fine grid, with cliffs located as precisely, for a fraction of the points, unless a notch (e.g. a benefit which starts and stops) lies entirely between two points of the coarse grid, in which case it is missed.
+
+    Args:
+        baseline (IndividualSim): The baseline simulation.
+        reformed (IndividualSim): The reformed simulation, if any.
+        earnings_variable (str): The earnings variable to vary.
+        vary_max (float): The maximum earnings.
+        config (PolicyEngineResultsConfig): The results configuration.
+        step (float, optional): The distance between points. Defaults to 100.
+        adaptive (bool, optional): Whether to vary earnings adaptively. Defaults to False.
+        coarse_step (float, optional): The distance between points of the coarse grid, if varying adaptively. Defaults to 1,000.
+    """
+    sims = [baseline] + ([reformed] if reformed is not None else [])
+    if not adaptive:
+        for sim in sims:
+            sim.vary(earnings_variable, step=step, max=vary_max)
+        return
+    refinement = max(1, round(coarse_step / step))
+    points = np.linspace(0, vary_max, int(np.ceil(vary_max / coarse_step)) + 1)
+    series = []
+    for sim in sims:
+        vary_at(sim, earnings_variable, points)
+        series += [
+            sim.calc(variable).sum(axis=0)
+            for variable in (
+                config.household_net_income_variable,
+                config.tax_variable,
+                config.benefit_variable,
+            )
+        ]
+    points = get_refined_points(points, series, refinement)
+    for sim in sims:
+        vary_at(sim, earnings_variable, points)
+
+
+def cliff_intervals(
+    earnings: np.ndarray, net_income: np.ndarray
+) -> List[Tuple[float, float]]:
+    """Identifies the earnings boundaries of net income cliffs: ranges of earnings over which net income is below its level at the start.
+
+    Args:
+        earnings (np.ndarray): Earnings, in increasing order.
+        net_income (np.ndarray): Net income at each level of earnings.
+
+    Returns:
+        List[Tuple[float, float]]: The start and end of each cliff.
+    """
+    earnings = np.asarray(earnings)
+    net_income = np.asarray(net_income)
+    starts = np.where(np.diff(net_income) < 0)[0]
+    if len(starts) == 0:
+        return []
+    start_net_income = net_income[starts]
+    # A cliff ends at the first point at which net income exceeds its level
+    # at the start, which is the first point its running maximum does.
+    running_max = np.maximum.accumulate(net_income)
+    ends = np.searchsorted(running_max, start_net_income, side="right")
+    recovered = ends < len(net_income)
+    # A cliff starts within an earlier one unless it starts from a higher
+    # net income than every earlier cliff.
+    keep = np.ones(len(starts), dtype=bool)
+    keep[1:] = (
+        start_net_income[1:] > np.maximum.accumulate(start_net_income)[:-1]
+    )
+    # A cliff net income never recovers from ends at the first point, so no
+    # later cliff starts within it.
+    unrecovered = np.where(keep & ~recovered)[0]
+    if len(unrecovered) > 0:
+        keep[unrecovered[0] + 1 :] = True
+    ends = np.where(recovered, ends, 0)
+    return list(zip(earnings[starts[keep]], earnings[ends[keep]]))
+
+
+class EarningsSweep:
+    """The results of varying a household's earnings, shared by the budget and marginal tax rate charts.
+
+    Each series (a variable summed over entities, at each level of earnings) and the net income cliffs of each simulation are calculated once, on first use.
+    """
+
+    def __init__(
+        self,
+        baseline: IndividualSim,
+        reformed: IndividualSim,
+        config: PolicyEngineResultsConfig,
+    ):
+        """Initialises the sweep.
+
+        Args:
+            baseline (IndividualSim): The baseline simulation, with earnings varied.
+            reformed (IndividualSim): The reformed simulation, with earnings varied, if any.
+            config (PolicyEngineResultsConfig): The results configuration.
+        """
+        self.baseline = baseline
+        self.reformed = reformed
+        self.config = config
+        self.has_reform = reformed is not None
+        self._series: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._cliffs: Dict[bool, List[Tuple[float, float]]] = {}
+
+    @classmethod
+    def from_arrays(
+        cls,
+        config: PolicyEngineResultsConfig,
+        baseline: dict,
+        reformed: dict = None,
+    ) -> "EarningsSweep":
+        """Builds a sweep from the arrays of simulations varied elsewhere (see `get_sweep_arrays`), which may have been varied adaptively over different points.
+
+        Each simulation's arrays are interpolated onto the points of both. Adaptive variation refines the same points of the coarse grid in each simulation that changes slope there, so this gives the points (and, where each simulation is linear, the values) that varying both together would.
+
+        Args:
+            config (PolicyEngineResultsConfig): The results configuration.
+            baseline (dict): The arrays of the baseline simulation.
+            reformed (dict, optional): The arrays of the reformed simulation, if any.
+
+        Returns:
+            EarningsSweep: The sweep, holding only the series in the arrays.
+        """
+        sweep = cls(None, None, config)
+        sweep.has_reform = reformed is not None
+        simulations = {False: baseline}
+        if reformed is not None:
+            simulations[True] = reformed
+        earnings = np.unique(
+            np.concatenate(
+                [arrays["earnings"] for arrays in simulations.values()]
+            )
+        )
+        for reform, arrays in simulations.items():
+
+            def interpolate(values: np.ndarray) -> np.ndarray:
+                return np.interp(earnings, arrays["earnings"], values)
+
+            for variable, values in arrays["series"].items():
+                sweep._series[variable, reform] = interpolate(values)
+            sweep._cliffs[reform] = cliff_intervals(
+                *map(interpolate, arrays["cliff_income"])
+            )
+        return sweep
+
+    def series(self, variable: str, reform: bool = False) -> np.ndarray:
+        """Gets the values of a variable, summed over entities, at each level of earnings.
+
+        Args:
+            variable (str): The variable.
+            reform (bool, optional): Whether to use the reformed simulation. Defaults to False.
+
+        Returns:
+            np.ndarray: The values.
+        """
+        key = variable, reform
+        if key not in self._series:
+            sim = self.reformed if reform else self.baseline
+            self._series[key] = sim.calc(variable).sum(axis=0)
+        return self._series[key]
+
+    def cliffs(self, reform: bool = False) -> List[Tuple[float, float]]:
+        """Gets the total income boundaries of net income cliffs.
+
+        Args:
+            reform (bool, optional): Whether to use the reformed simulation. Defaults to False.
+
+        Returns:
+            List[Tuple[float, float]]: The start and end of each cliff.
+        """
+        if reform not in self._cliffs:
+            sim = self.reformed if reform else self.baseline
+            self._cliffs[reform] = cliff_intervals(
+                sim.calc(self.config.total_income_variable)[0],
+                sim.calc(self.config.household_net_income_variable)[0],
+            )
+        return self._cliffs[reform]
+
+
+def get_sweep_arrays(
+    sim: IndividualSim,
+    earnings_variable: str,
+    config: PolicyEngineResultsConfig,
+) -> dict:
+    """Calculates the arrays used by the budget and marginal tax rate charts from a simulation with earnings varied, in a form which can be sent between processes.
+
+    Args:
+        sim (IndividualSim): The simulation, with earnings varied.
+        earnings_variable (str): The earnings variable varied.
+        config (PolicyEngineResultsConfig): The results configuration.
+
+    Returns:
+        dict: The earnings at each point, the series of each chart variable and the total and net income used to find cliffs.
+    """
+    sweep = EarningsSweep(sim, None, config)
+    return dict(
+        earnings=sim.calc(earnings_variable)[0],
+        series={
+            variable: sweep.series(variable)
+            for variable in (
+                config.total_income_variable,
+                config.household_net_income_variable,
+                config.tax_variable,
+                config.benefit_variable,
+            )
+        },
+        cliff_income=(
+            sim.calc(config.total_income_variable)[0],
+            sim.calc(config.household_net_income_variable)[0],
+        ),
+    )
@@ -2,7 +2,7 @@ from matplotlib import cm
 from policyengine.country.results_config import PolicyEngineResultsConfig
 import pandas as pd
 import plotly.express as px
-from policyengine.impact.population.metrics import spending
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.impact.utils.text import format_summary_of_parameter_value
 from ..utils import *
 import numpy as np
@@ -36,37 +36,41 @@ def get_breakdown_and_chart_per_provision(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: PolicyEngineResultsConfig,
+    frame: PopulationImpactFrame = None,
+    progress: Callable[[dict], None] = None,
+    step_key: Callable[[dict], str] = None,
 ) -> dict:
     """Generates a breakdown data structure with spending per provision.
 
+    The reform of each step (the first n provisions) is simulated in turn, and the impact of each step is kept for reuse by later requests sharing it. Steps aren't simulated concurrently: this already runs in a task worker (usually a forked process, which can't use the household pool), each step holds a full population microsimulation in memory, and a request usually only needs its last step simulated, as earlier steps are kept from previous requests.
+
     Args:
         country (PolicyEngineCountry): Country object.
         parameters (dict): Parameters for the reform.
         baseline (Microsimulation): The baseline microsimulation.
         reformed (Microsimulation): The reformed microsimulation.
         config (PolicyEngineResultsConfig): Country configuration.
+        frame (PopulationImpactFrame, optional): Shared simulation outputs, if already computed.
+        progress (Callable[[dict], None], optional): A function called with the breakdown of the first provisions, each time another provision's impact is known.
+        step_key (Callable[[dict], str], optional): A function returning the key a step's impact is stored under, given the parameters it depends on. Step impacts are not reused if omitted.
 
     Returns:
         dict: The breakdown details.
     """
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
 
-    cumulative_spending = []
-
-    def formatter(x):
-        return round(float(x) / 1e9, 2)
-
-    decile_impacts = pd.DataFrame()
-
-    income = baseline.calc(
-        config.household_net_income_variable, map_to="person"
+    income = frame.calc(
+        "baseline", config.household_net_income_variable, "person"
     )
-    equiv_income = baseline.calc(
-        config.equiv_household_net_income_variable, map_to="person"
+    decile = frame.decile_rank(
+        "baseline", config.equiv_household_net_income_variable, "person"
     )
+    baseline_net_income = frame.calc(
+        "baseline", config.household_net_income_variable
+    ).sum()
+    income_by_decile = income.groupby(decile)
+    income_by_decile = (income_by_decile.sum(), income_by_decile.count())
 
-    previous_gains = pd.Series([0] * 10, index=list(range(1, 11)))
-    colour_positions = [0]
-    provision_data = {}
     parameter_keys = [
         key
         for key in parameters.keys()
@@ -81,36 +85,125 @@ def get_breakdown_and_chart_per_provision(
                 parameters[parameter_key],
             )
         )
+    # Parameters other than the provisions affect the baseline.
+    context = {
+        key: value
+        for key, value in parameters.items()
+        if key not in parameter_keys
+    }
+    edits_baseline = any("baseline_" in key for key in context)
 
-    for step in range(1, len(provisions) + 1):
+    def get_step_impact(step: int) -> dict:
         step_parameters = {
             key: parameters[key] for key in parameter_keys[:step]
         }
-        if step == len(provisions):
-            reform_sim = reformed
-        else:
-            _, reform_sim = country.create_microsimulations(step_parameters)
-        cumulative_spending += [spending(reform_sim, baseline, config)]
-        gain = (
-            reform_sim.calc(
-                config.household_net_income_variable, map_to="person"
+        key_parameters = {**context, **step_parameters}
+        if step == len(provisions) and edits_baseline:
+            # The full reform also edits the baseline parameters, unlike
+            # the other steps.
+            key_parameters["full_reform"] = True
+        key = step_key(key_parameters) if step_key is not None else None
+        impact = (
+            country.provision_step_impacts.get(key)
+            if key is not None
+            else None
+        )
+        if impact is None:
+            if step == len(provisions):
+                reform_sim = reformed
+            else:
+                _, reform_sim = country.create_microsimulations(
+                    step_parameters
+                )
+            gain = (
+                reform_sim.calc(
+                    config.household_net_income_variable, map_to="person"
+                )
+                - income
+            )
+            impact = dict(
+                spending=float(
+                    baseline_net_income
+                    - reform_sim.calc(
+                        config.household_net_income_variable
+                    ).sum()
+                ),
+                gain_by_decile=list(
+                    map(
+                        float,
+                        gain.groupby(decile).sum().reindex(range(1, 11)),
+                    )
+                ),
             )
-            - income
+            if key is not None:
+                country.provision_step_impacts.set(key, impact)
+        return impact
+
+    step_impacts = []
+    for step in range(1, len(provisions) + 1):
+        step_impacts.append(get_step_impact(step))
+        if progress is not None and step < len(provisions):
+            progress(
+                get_breakdown_charts(
+                    provisions[:step],
+                    step_impacts,
+                    income_by_decile,
+                    config,
+                )
+            )
+
+    return get_breakdown_charts(
+        provisions,
+        step_impacts,
+        income_by_decile,
+        config,
+    )
+
+
+def get_breakdown_charts(
+    provisions: List[str],
+    step_impacts: List[dict],
+    income_by_decile: Tuple[pd.Series, pd.Series],
+    config: PolicyEngineResultsConfig,
+) -> dict:
+    """Generates the breakdown data structure from the impacts of each step of a reform.
+
+    Args:
+        provisions (List[str]): The descriptions of the provisions.
+        step_impacts (List[dict]): The spending and total gain by decile of each step (the first n provisions).
+        income_by_decile (Tuple[pd.Series, pd.Series]): The total baseline income and number of people in each decile.
+        config (PolicyEngineResultsConfig): Country configuration.
+
+    Returns:
+        dict: The breakdown details.
+    """
+
+    def formatter(x):
+        return round(float(x) / 1e9, 2)
+
+    cumulative_spending = [impact["spending"] for impact in step_impacts]
+    income_sum, income_count = income_by_decile
+    decile_impacts = pd.DataFrame()
+    previous_gains = pd.Series([0] * 10, index=list(range(1, 11)))
+    colour_positions = [0]
+    provision_data = {}
+
+    for provision, impact in zip(provisions, step_impacts):
+        gain_by_decile = pd.Series(
+            impact["gain_by_decile"], index=list(range(1, 11))
         )
-        gain_by_decile = gain.groupby(equiv_income.decile_rank()).sum()
         gain_by_decile -= previous_gains
         previous_gains += gain_by_decile
-        income_by_decile = income.groupby(equiv_income.decile_rank())
         gain_df = pd.DataFrame(
             {
                 "Decile": gain_by_decile.index,
-                "Relative change": (gain_by_decile / income_by_decile.sum())
+                "Relative change": (gain_by_decile / income_sum)
                 .round(3)
                 .values,
-                "Average change": (gain_by_decile / income_by_decile.count())
+                "Average change": (gain_by_decile / income_count)
                 .round()
                 .values,
-                "Provision": provisions[step - 1],
+                "Provision": provision,
             }
         )
         decile_impacts = pd.concat([decile_impacts, gain_df])
@@ -121,7 +214,7 @@ def get_breakdown_and_chart_per_provision(
             # Reform has a negative (assumed in all deciles) impact
             pos = min(colour_positions) - 1
         colour_positions += [pos]
-        provision_data[provisions[step - 1]] = dict(
+        provision_data[provision] = dict(
             position=pos,
             decile_impact=list(map(float, list(gain_by_decile.values))),
         )
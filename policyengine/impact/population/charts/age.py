@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
@@ -11,6 +12,7 @@ def age_chart(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> dict:
     """Generates a bar chart showing the impact of a reform by age.
 
@@ -18,21 +20,16 @@ def age_chart(
         baseline (Microsimulation): The baseline simulation.
         reformed (Microsimulation): The reformed simulation.
         config (Type[PolicyEngineResultsConfig]): The country metadata.
+        frame (PopulationImpactFrame, optional): Shared simulation outputs, if already computed.
 
     Returns:
         dict: The Plotly JSON.
     """
-
-    baseline_household_net_income = baseline.calc(
-        config.household_net_income_variable,
-        map_to="person",
-    )
-    reform_household_net_income = reformed.calc(
-        config.household_net_income_variable,
-        map_to="person",
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
+    age = frame.calc("baseline", "age")
+    gain = frame.difference(
+        config.household_net_income_variable, map_to="person"
     )
-    age = baseline.calc("age")
-    gain = reform_household_net_income - baseline_household_net_income
     gain_by_age = gain.groupby(age).sum() / gain.groupby(age).count()
     df = pd.DataFrame(
         {
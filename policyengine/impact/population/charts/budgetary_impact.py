@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
@@ -81,6 +82,7 @@ def tax_benefit_waterfall_data(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> pd.DataFrame:
     """Generates data for tax benefit waterfall charts.
 
@@ -88,14 +90,21 @@ def tax_benefit_waterfall_data(
     :type baseline: Union[Microsimulation, IndividualSim]
     :param reformed: Reformed microsimulation.
     :type reformed: Union[Microsimulation, IndividualSim]
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: DataFrame with two rows for each component plus the total.
     :rtype: pd.DataFrame
     """
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
     GROUPS = [config.tax_variable, config.benefit_variable]
     multipliers = [1, -1]
     effects = [
         float(
-            (reformed.calc(var).sum() - baseline.calc(var).sum()) * multiplier
+            (
+                frame.calc("reformed", var).sum()
+                - frame.calc("baseline", var).sum()
+            )
+            * multiplier
         )
         for var, multiplier in zip(GROUPS, multipliers)
     ]
@@ -148,6 +157,7 @@ def waterfall_chart(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> dict:
     """Create a waterfall chart for tax and benefit changes.
 
@@ -155,10 +165,12 @@ def waterfall_chart(
     :type baseline: Union[Microsimulation, IndividualSim]
     :param reformed: Reform simulation.
     :type reformed: Union[Microsimulation, IndividualSim]
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: Waterfall chart as a JSON dict.
     :rtype: dict
     """
-    data = tax_benefit_waterfall_data(baseline, reformed, config)
+    data = tax_benefit_waterfall_data(baseline, reformed, config, frame)
     data["hover"] = data.apply(
         lambda x: hover_label(x.label, x.amount, config), axis=1
     )
@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
@@ -46,6 +47,7 @@ def decile_chart(
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
     decile_type: str = "income",
+    frame: PopulationImpactFrame = None,
 ) -> Tuple[dict, dict]:
     """Chart of average net effect of a reform by income decile.
 
@@ -53,28 +55,28 @@ def decile_chart(
     :type baseline: Microsimulation
     :param reformed: Reform microsimulation.
     :type reformed: Microsimulation
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: Decile charts (relative and absolute) as JSON representations of Plotly charts.
     :rtype: Tuple[dict, dict]
     """
-    baseline_household_net_income = baseline.calc(
-        config.household_net_income_variable
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
+    baseline_household_net_income = frame.calc(
+        "baseline", config.household_net_income_variable
     )
-    baseline_household_equiv_income = baseline.calc(
-        config.equiv_household_net_income_variable
-        if decile_type == "income"
-        else config.household_wealth_variable
-    )
-    reform_household_net_income = reformed.calc(
-        config.household_net_income_variable
-    )
-    household_gain = (
-        reform_household_net_income - baseline_household_net_income
+    reform_household_net_income = frame.calc(
+        "reformed", config.household_net_income_variable
     )
-    household_size = baseline.calc("people", map_to=config.household_entity)
+    household_gain = frame.difference(config.household_net_income_variable)
     # Group households in decile such that each decile has the same
     # number of people
-    baseline_household_equiv_income.weights *= household_size
-    household_decile = baseline_household_equiv_income.decile_rank()
+    household_decile = frame.decile_rank(
+        "baseline",
+        config.equiv_household_net_income_variable
+        if decile_type == "income"
+        else config.household_wealth_variable,
+        people_weighted=True,
+    )
     agg_gain_by_decile = household_gain.groupby(household_decile).sum()
     households_by_decile = baseline_household_net_income.groupby(
         household_decile
@@ -4,6 +4,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
@@ -11,33 +12,40 @@ def inequality_chart(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> dict:
-    equiv_income = baseline.calc(
-        config.equiv_household_net_income_variable, map_to="person"
-    )
-    reform_equiv_income = reformed.calc(
-        config.equiv_household_net_income_variable, map_to="person"
-    )
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
+    income_variable = config.equiv_household_net_income_variable
+    equiv_income = frame.calc("baseline", income_variable, "person")
+    reform_equiv_income = frame.calc("reformed", income_variable, "person")
     baseline_gini = equiv_income.gini()
     reform_gini = reform_equiv_income.gini()
     gini_change = reform_gini / baseline_gini - 1
     baseline_top_ten_pct_share = (
-        equiv_income[equiv_income.decile_rank() == 10].sum()
+        equiv_income[
+            frame.decile_rank("baseline", income_variable, "person") == 10
+        ].sum()
         / equiv_income.sum()
     )
     reform_top_ten_pct_share = (
-        reform_equiv_income[reform_equiv_income.decile_rank() == 10].sum()
+        reform_equiv_income[
+            frame.decile_rank("reformed", income_variable, "person") == 10
+        ].sum()
         / reform_equiv_income.sum()
     )
     top_ten_pct_share_change = (
         reform_top_ten_pct_share / baseline_top_ten_pct_share - 1
     )
     baseline_top_one_pct_share = (
-        equiv_income[equiv_income.percentile_rank() == 100].sum()
+        equiv_income[
+            frame.percentile_rank("baseline", income_variable, "person") == 100
+        ].sum()
         / equiv_income.sum()
     )
     reform_top_one_pct_share = (
-        reform_equiv_income[reform_equiv_income.percentile_rank() == 100].sum()
+        reform_equiv_income[
+            frame.percentile_rank("reformed", income_variable, "person") == 100
+        ].sum()
         / reform_equiv_income.sum()
     )
     top_one_pct_share_change = (
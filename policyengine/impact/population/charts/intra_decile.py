@@ -6,6 +6,7 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
@@ -17,12 +18,73 @@ NAMES = (
     "Lose more than 5%",
 )
 
+# Upper bounds (inclusive) of each outcome band in relative gain, from the
+# largest loss to the largest gain (the reverse of NAMES).
+BAND_EDGES = (-0.05, -1e-3, 1e-3, 0.05)
+
+
+def intra_decile_outcome_shares(
+    rel_gain: np.ndarray, decile: np.ndarray, weights: np.ndarray
+) -> pd.DataFrame:
+    """Shares of each decile (and overall) in each outcome band, computed as a single weighted histogram.
+
+    :param rel_gain: Relative change in net income for each person.
+    :type rel_gain: np.ndarray
+    :param decile: Decile (1 to 10) of each person.
+    :type decile: np.ndarray
+    :param weights: Weight of each person.
+    :type weights: np.ndarray
+    :return: DataFrame with share of each decile experiencing each outcome.
+    :rtype: pd.DataFrame
+    """
+    rel_gain = np.asarray(rel_gain, dtype=float)
+    decile = np.asarray(decile, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    num_bands = len(NAMES)
+    # Index bands in the order of NAMES, from the largest gain downwards.
+    band = len(BAND_EDGES) - np.digitize(rel_gain, BAND_EDGES, right=True)
+    # Missing changes fall in no band, but still count towards the totals.
+    band_weights = np.where(np.isnan(rel_gain), 0, weights)
+    # People outside deciles 1 to 10 share slot 0, counting only overall.
+    decile = np.where((decile >= 1) & (decile <= 10), decile, 0).astype(int)
+    band_totals = np.bincount(
+        decile * num_bands + band,
+        weights=band_weights,
+        minlength=11 * num_bands,
+    ).reshape(11, num_bands)
+    decile_totals = np.bincount(decile, weights=weights, minlength=11)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decile_shares = band_totals[1:] / decile_totals[1:, np.newaxis]
+        overall_shares = band_totals.sum(axis=0) / weights.sum()
+    l = []
+    for i, name in enumerate(NAMES):
+        l.append(
+            pd.DataFrame(
+                {
+                    "fraction": decile_shares[:, i],
+                    "decile": list(map(str, range(1, 11))),
+                    "outcome": name,
+                }
+            )
+        )
+        l.append(
+            pd.DataFrame(
+                {
+                    "fraction": [overall_shares[i]],
+                    "decile": "All",
+                    "outcome": name,
+                }
+            )
+        )
+    return pd.concat(l).reset_index()
+
 
 def intra_decile_graph_data(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
     decile_type: str = "income",
+    frame: PopulationImpactFrame = None,
 ) -> pd.DataFrame:
     """Data for the distribution of net income changes by decile and overall.
 
@@ -30,57 +92,29 @@ def intra_decile_graph_data(
     :type baseline: Microsimulation
     :param reformed: Reform simulation.
     :type reformed: Microsimulation
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: DataFrame with share of each decile experiencing each outcome.
     :rtype: pd.DataFrame
     """
-    l = []
-    income = baseline.calc(
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
+    decile = frame.decile_rank(
+        "baseline",
         config.equiv_household_net_income_variable
         if decile_type == "income"
         else config.household_wealth_variable,
         map_to="person",
     )
-    decile = income.decile_rank()
-    baseline_hh_net_income = baseline.calc(
-        config.household_net_income_variable, map_to="person"
+    baseline_hh_net_income = frame.calc(
+        "baseline", config.household_net_income_variable, map_to="person"
     )
-    reformed_hh_net_income = reformed.calc(
+    gain = frame.difference(
         config.household_net_income_variable, map_to="person"
     )
-    gain = reformed_hh_net_income - baseline_hh_net_income
-    rel_gain = gain / np.maximum(baseline_hh_net_income, 1)
-    BANDS = (None, 0.05, 1e-3, -1e-3, -0.05, None)
-    for upper, lower, name in zip(BANDS[:-1], BANDS[1:], NAMES):
-        fractions = []
-        for j in range(1, 11):
-            subset = rel_gain[decile == j]
-            if lower is not None:
-                subset = subset[rel_gain > lower]
-            if upper is not None:
-                subset = subset[rel_gain <= upper]
-            fractions += [subset.count() / rel_gain[decile == j].count()]
-        tmp = pd.DataFrame(
-            {
-                "fraction": fractions,
-                "decile": list(map(str, range(1, 11))),
-                "outcome": name,
-            }
-        )
-        l.append(tmp)
-        subset = rel_gain
-        if lower is not None:
-            subset = subset[rel_gain > lower]
-        if upper is not None:
-            subset = subset[rel_gain <= upper]
-        all_row = pd.DataFrame(
-            {
-                "fraction": [subset.count() / rel_gain.count()],
-                "decile": "All",
-                "outcome": name,
-            }
-        )
-        l.append(all_row)
-    return pd.concat(l).reset_index()
+    rel_gain = gain.values / np.maximum(baseline_hh_net_income.values, 1)
+    return intra_decile_outcome_shares(
+        rel_gain, decile.values, np.array(gain.weights)
+    )
 
 
 INTRA_DECILE_COLORS = (
@@ -145,6 +179,7 @@ def intra_decile_chart(
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
     decile_type: str = "income",
+    frame: PopulationImpactFrame = None,
 ) -> dict:
     """Full intra-decile chart, including a top bar for overall.
 
@@ -152,11 +187,13 @@ def intra_decile_chart(
     :type baseline: Microsimulation
     :param reformed: Reform simulation.
     :type reformed: Microsimulation
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: JSON representation of Plotly intra-decile chart.
     :rtype: dict
     """
     df = intra_decile_graph_data(
-        baseline, reformed, config, decile_type=decile_type
+        baseline, reformed, config, decile_type=decile_type, frame=frame
     )
     df["hover"] = df.apply(
         lambda x: intra_decile_label(
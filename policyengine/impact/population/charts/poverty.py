@@ -4,64 +4,16 @@ import numpy as np
 from openfisca_tools import Microsimulation
 import pandas as pd
 from policyengine.impact.utils import *
-from policyengine.impact.population.metrics import (
-    deep_poverty_rate,
-    poverty_rate,
-)
+from policyengine.impact.population.frame import PopulationImpactFrame
 from policyengine.country.results_config import PolicyEngineResultsConfig
 
 
-def pov_chg(
-    baseline: Microsimulation,
-    reformed: Microsimulation,
-    criterion: str,
-    config: Type[PolicyEngineResultsConfig],
-) -> float:
-    """Calculate change in poverty rates.
-
-    :param baseline: Baseline simulation.
-    :type baseline: Microsimulation
-    :param reform: Reform simulation.
-    :type reform: Microsimulation
-    :param criterion: Filter for each simulation.
-    :type criterion: str
-    :return: Percentage (not percentage point) difference in poverty rates.
-    :rtype: float
-    """
-    return pct_change(
-        poverty_rate(baseline, criterion, config),
-        poverty_rate(reformed, criterion, config),
-    )
-
-
-def deep_pov_chg(
-    baseline: Microsimulation,
-    reformed: Microsimulation,
-    criterion: str,
-    config: Type[PolicyEngineResultsConfig],
-) -> float:
-    """Calculate change in poverty rates.
-
-    :param baseline: Baseline simulation.
-    :type baseline: Microsimulation
-    :param reform: Reform simulation.
-    :type reform: Microsimulation
-    :param criterion: Filter for each simulation.
-    :type criterion: str
-    :return: Percentage (not percentage point) difference in poverty rates.
-    :rtype: float
-    """
-    return pct_change(
-        deep_poverty_rate(baseline, criterion, config),
-        deep_poverty_rate(reformed, criterion, config),
-    )
-
-
 def poverty_chart(
     baseline: Microsimulation,
     reformed: Microsimulation,
     is_deep: bool,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> dict:
     """Chart of poverty impact by age group and overall.
 
@@ -69,6 +21,8 @@ def poverty_chart(
     :type baseline: Microsimulation
     :param reformed: Reform microsimulation.
     :type reformed: Microsimulation
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: JSON representation of Plotly chart with poverty impact for:
         - Children (under 18)
         - Working age adults (18 to State Pension age)
@@ -76,44 +30,39 @@ def poverty_chart(
         - Overall
     :rtype: dict
     """
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
     if is_deep:
-        f_pov_chg = deep_pov_chg
-        f_poverty_rate = deep_poverty_rate
+        poverty_variable = config.in_deep_poverty_variable
         metric_name = "Deep poverty"
     else:
-        f_pov_chg = pov_chg
-        f_poverty_rate = poverty_rate
+        poverty_variable = config.in_poverty_variable
         metric_name = "Poverty"
+    groups = [
+        config.child_variable,
+        config.working_age_variable,
+        config.senior_variable,
+        config.person_variable,
+    ]
+    rates = {
+        simulation: [
+            frame.calc(simulation, poverty_variable, "person")[
+                frame.calc(simulation, group) > 0
+            ].mean()
+            for group in groups
+        ]
+        for simulation in ("baseline", "reformed")
+    }
     df = pd.DataFrame(
         {
             "group": ["Child", "Working-age", "Senior", "All"],
             "pov_chg": [
-                f_pov_chg(baseline, reformed, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
-            ],
-            "baseline": [
-                f_poverty_rate(baseline, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
-            ],
-            "reformed": [
-                f_poverty_rate(reformed, i, config)
-                for i in [
-                    config.child_variable,
-                    config.working_age_variable,
-                    config.senior_variable,
-                    config.person_variable,
-                ]
+                pct_change(baseline_rate, reformed_rate)
+                for baseline_rate, reformed_rate in zip(
+                    rates["baseline"], rates["reformed"]
+                )
             ],
+            "baseline": rates["baseline"],
+            "reformed": rates["reformed"],
         }
     )
     df["abs_chg_str"] = df.pov_chg.abs().map("{:.1%}".format)
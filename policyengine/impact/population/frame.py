@@ -0,0 +1,150 @@
+"""
+A per-request store of microsimulation outputs shared by the population impact charts.
+"""
+from typing import Dict, Tuple, Type
+import numpy as np
+from microdf import MicroSeries
+from openfisca_tools import Microsimulation
+from policyengine.country.results_config import PolicyEngineResultsConfig
+
+
+class PopulationImpactFrame:
+    """Computes each (simulation, variable, map_to) array and each quantile ranking of a baseline-reform pair once, on first use.
+
+    Arrays returned by the frame are shared between every chart using it, so they must not be modified in place.
+    """
+
+    SIMULATIONS: Tuple[str] = ("baseline", "reformed")
+
+    def __init__(
+        self,
+        baseline: Microsimulation,
+        reformed: Microsimulation,
+        config: Type[PolicyEngineResultsConfig],
+    ):
+        """Initialises the frame.
+
+        Args:
+            baseline (Microsimulation): The baseline microsimulation.
+            reformed (Microsimulation): The reformed microsimulation.
+            config (Type[PolicyEngineResultsConfig]): The results configuration.
+        """
+        self.baseline = baseline
+        self.reformed = reformed
+        self.config = config
+        self._arrays: Dict[tuple, MicroSeries] = {}
+        self._ranks: Dict[tuple, MicroSeries] = {}
+
+    def _simulation(self, simulation: str) -> Microsimulation:
+        if simulation not in self.SIMULATIONS:
+            raise ValueError(
+                f"Unknown simulation {simulation} (expected one of {', '.join(self.SIMULATIONS)})."
+            )
+        return getattr(self, simulation)
+
+    def calc(
+        self, simulation: str, variable: str, map_to: str = None
+    ) -> MicroSeries:
+        """Calculates a variable in one of the simulations.
+
+        Args:
+            simulation (str): "baseline" or "reformed".
+            variable (str): The variable name.
+            map_to (str, optional): The entity to map the result to. Defaults to the variable's own entity.
+
+        Returns:
+            MicroSeries: The weighted values.
+        """
+        key = (simulation, variable, map_to)
+        if key not in self._arrays:
+            sim = self._simulation(simulation)
+            if map_to is None:
+                self._arrays[key] = sim.calc(variable)
+            else:
+                self._arrays[key] = sim.calc(variable, map_to=map_to)
+        return self._arrays[key]
+
+    def difference(self, variable: str, map_to: str = None) -> MicroSeries:
+        """The reformed value of a variable minus its baseline value.
+
+        Args:
+            variable (str): The variable name.
+            map_to (str, optional): The entity to map the result to.
+
+        Returns:
+            MicroSeries: The weighted change.
+        """
+        key = ("difference", variable, map_to)
+        if key not in self._arrays:
+            self._arrays[key] = self.calc(
+                "reformed", variable, map_to
+            ) - self.calc("baseline", variable, map_to)
+        return self._arrays[key]
+
+    def _rank(
+        self,
+        method: str,
+        simulation: str,
+        variable: str,
+        map_to: str,
+        people_weighted: bool,
+    ) -> MicroSeries:
+        key = (method, simulation, variable, map_to, people_weighted)
+        if key not in self._ranks:
+            values = self.calc(simulation, variable, map_to)
+            if people_weighted:
+                # Group households such that each quantile has the same
+                # number of people.
+                household_size = self.calc(
+                    simulation, "people", self.config.household_entity
+                )
+                values = MicroSeries(
+                    values.values,
+                    weights=np.array(values.weights) * household_size.values,
+                )
+            self._ranks[key] = getattr(values, method)()
+        return self._ranks[key]
+
+    def decile_rank(
+        self,
+        simulation: str,
+        variable: str,
+        map_to: str = None,
+        people_weighted: bool = False,
+    ) -> MicroSeries:
+        """The decile of each entity by a variable's value.
+
+        Args:
+            simulation (str): "baseline" or "reformed".
+            variable (str): The variable to rank by.
+            map_to (str, optional): The entity to map the variable to before ranking.
+            people_weighted (bool, optional): Whether to weight household-level values by household size. Defaults to False.
+
+        Returns:
+            MicroSeries: The decile ranks (1 to 10).
+        """
+        return self._rank(
+            "decile_rank", simulation, variable, map_to, people_weighted
+        )
+
+    def percentile_rank(
+        self,
+        simulation: str,
+        variable: str,
+        map_to: str = None,
+        people_weighted: bool = False,
+    ) -> MicroSeries:
+        """The percentile of each entity by a variable's value.
+
+        Args:
+            simulation (str): "baseline" or "reformed".
+            variable (str): The variable to rank by.
+            map_to (str, optional): The entity to map the variable to before ranking.
+            people_weighted (bool, optional): Whether to weight household-level values by household size. Defaults to False.
+
+        Returns:
+            MicroSeries: The percentile ranks (1 to 100).
+        """
+        return self._rank(
+            "percentile_rank", simulation, variable, map_to, people_weighted
+        )
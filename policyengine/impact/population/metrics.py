@@ -5,6 +5,7 @@ from typing import Type
 from policyengine.country.results_config import PolicyEngineResultsConfig
 from openfisca_tools import Microsimulation
 from policyengine.impact.utils import *
+from policyengine.impact.population.frame import PopulationImpactFrame
 
 
 def poverty_rate(
@@ -31,6 +32,7 @@ def headline_metrics(
     baseline: Microsimulation,
     reformed: Microsimulation,
     config: Type[PolicyEngineResultsConfig],
+    frame: PopulationImpactFrame = None,
 ) -> dict:
     """Compute headline society-wide metrics.
 
@@ -38,24 +40,23 @@ def headline_metrics(
     :type baseline: Microsimulation
     :param reformed: Reform simulation.
     :type reformed: Microsimulation
+    :param frame: Shared simulation outputs, if already computed.
+    :type frame: PopulationImpactFrame
     :return: Dictionary with net_cost, poverty_change, winner_share,
         loser_share, and gini_change.
     :rtype: dict
     """
-    new_income = reformed.calc(
+    frame = frame or PopulationImpactFrame(baseline, reformed, config)
+    gain = frame.difference(
         config.household_net_income_variable, map_to="person"
     )
-    old_income = baseline.calc(
-        config.household_net_income_variable, map_to="person"
-    )
-    gain = new_income - old_income
     net_cost = (
-        reformed.calc(config.household_net_income_variable).sum()
-        - baseline.calc(config.household_net_income_variable).sum()
+        frame.calc("reformed", config.household_net_income_variable).sum()
+        - frame.calc("baseline", config.household_net_income_variable).sum()
     )
     poverty_change = pct_change(
-        baseline.calc(config.in_poverty_variable, map_to="person").mean(),
-        reformed.calc(config.in_poverty_variable, map_to="person").mean(),
+        frame.calc("baseline", config.in_poverty_variable, "person").mean(),
+        frame.calc("reformed", config.in_poverty_variable, "person").mean(),
     )
     winner_share = (gain > 0).mean()
     loser_share = (gain < 0).mean()
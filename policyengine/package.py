@@ -1,3 +1,10 @@
+import os
 from pathlib import Path
 
 POLICYENGINE_PACKAGE_PATH = Path(__file__).parent
+
+POLICYENGINE_STORAGE_PATH = Path(
+    os.environ.get(
+        "POLICYENGINE_STORAGE_PATH", POLICYENGINE_PACKAGE_PATH / "storage"
+    )
+)
@@ -4,15 +4,25 @@ from flask import Flask
 from flask_cors import CORS
 from policyengine.web_server.cache import (
     DisabledCache,
+    DiskCache,
+    LayeredCache,
     LocalCache,
+    LRUStore,
     PolicyEngineCache,
     add_params_and_caching,
 )
+from policyengine.web_server.tasks import (
+    ProcessTaskExecutor,
+    TaskScheduler,
+    ThreadTaskExecutor,
+)
+from policyengine.web_server.serialisation import ResultCodec
 from policyengine.web_server.logging import PolicyEngineLogger, logged_endpoint
 from policyengine.web_server.cors import after_request_func
 from policyengine.web_server.static_site import add_static_site_handling
 from policyengine.package import POLICYENGINE_PACKAGE_PATH
 from .country import PolicyEngineCountry, UK, US
+from .country.household_pool import HouseholdPool
 
 
 class PolicyEngine:
@@ -26,10 +36,45 @@ class PolicyEngine:
     """The name of the Google Cloud Storage bucket used to cache results.
     """
 
+    cache_codec: str = "json.gz"
+    """The encoding of results stored in the storage bucket or local cache database, e.g. "json.gz" or "msgpack.zst" (which need the optional msgpack and zstandard packages). Overridden by the POLICYENGINE_CACHE_CODEC environment variable.
+    """
+
+    memory_cache_size: int = 128 * 2**20
+    """The maximum size, in bytes, of results kept in memory in front of the storage bucket.
+    """
+
+    memoised_results_size: int = 64 * 2**20
+    """The maximum size, in bytes, of household-level endpoint results kept in memory for identical requests.
+    """
+
+    local_cache_path: str = None
+    """The path of a SQLite database storing results when not using the storage bucket, shared between server processes and kept across restarts. Overridden by the POLICYENGINE_CACHE_PATH environment variable. If unset, results are kept in memory.
+    """
+
+    local_cache_size: int = 2**30
+    """The maximum size, in encoded bytes, of the local cache database.
+    """
+
     countries: Tuple[Type[PolicyEngineCountry]] = (UK, US)
     """The country models supported by the PolicyEngine API.
     """
 
+    task_executor: str = "thread"
+    """The backend running cached endpoints: "thread" (a thread per request) or "process" (a pool of forked worker processes). Overridden by the POLICYENGINE_TASK_EXECUTOR environment variable.
+    """
+
+    task_workers: int = 2
+    """The number of cached endpoint tasks run at once.
+    """
+
+    task_queue_length: int = 16
+    """The number of cached endpoint tasks which can wait to run before further requests are rejected.
+    """
+
+    scheduler: TaskScheduler
+    """The scheduler queueing and running cached endpoints."""
+
     app: Flask
     """The Flask application handling the web server."""
 
@@ -48,8 +93,16 @@ class PolicyEngine:
         self.log("Initialising server.")
         self._init_countries()
         self._init_cache()
+        self._init_scheduler()
         self._init_flask()
         self._init_routes()
+        # Worker processes are forked before logging starts its background
+        # thread.
+        if isinstance(self.scheduler.executor, ProcessTaskExecutor):
+            self.scheduler.executor.start_workers()
+        else:
+            self._init_household_pool()
+        self.logger.start_cloud_logging()
         self.log("Initialisation complete.")
 
     def _init_countries(self):
@@ -57,14 +110,77 @@ class PolicyEngine:
         self.countries = tuple(map(lambda country: country(), self.countries))
 
     def _init_cache(self):
-        """Initialise the cache for load-intensive endpoint results."""
+        """Initialise the caches for load-intensive and household-level endpoint results."""
+        codec = ResultCodec(
+            os.environ.get("POLICYENGINE_CACHE_CODEC", self.cache_codec)
+        )
         if self.cache_bucket_name is not None and not self.debug_mode:
             print("Initialising cache.")
-            self.cache = PolicyEngineCache(
-                self.version, self.cache_bucket_name
+            self.cache = LayeredCache(
+                PolicyEngineCache(
+                    self.version, self.cache_bucket_name, codec=codec
+                ),
+                LRUStore(self.memory_cache_size),
             )
         else:
-            self.cache = LocalCache(self.version)
+            local_cache_path = os.environ.get(
+                "POLICYENGINE_CACHE_PATH", self.local_cache_path
+            )
+            if local_cache_path:
+                self.cache = DiskCache(
+                    self.version,
+                    local_cache_path,
+                    self.local_cache_size,
+                    codec=codec,
+                )
+            else:
+                self.cache = LocalCache(self.version)
+        self.memo = LRUStore(self.memoised_results_size)
+
+    def _init_scheduler(self):
+        """Initialise the scheduler and backend running cached endpoints."""
+        task_executor = os.environ.get(
+            "POLICYENGINE_TASK_EXECUTOR", self.task_executor
+        )
+        if task_executor == "process":
+            # Forked workers inherit the baselines built here, rather than
+            # each building their own.
+            for country in self.countries:
+                if (
+                    country.dataset is not None
+                    and country.baseline_microsimulation is None
+                ):
+                    country.baseline_microsimulation = (
+                        country.create_baseline_microsimulation()
+                    )
+            executor = ProcessTaskExecutor(
+                self.task_workers,
+                initializer=self.logger.start_cloud_logging,
+            )
+        elif task_executor == "thread":
+            executor = ThreadTaskExecutor()
+        else:
+            raise ValueError(
+                f"Unknown task executor {task_executor} (expected thread or process)."
+            )
+        self.scheduler = TaskScheduler(
+            executor, self.task_workers, self.task_queue_length
+        )
+
+    def _init_household_pool(self):
+        """Fork the workers varying reformed households for the countries using them, while the server has no other threads running."""
+        countries = [
+            country
+            for country in self.countries
+            if country.household_variation_workers > 0
+        ]
+        if not countries:
+            return
+        household_pool = HouseholdPool(
+            countries, initializer=self.logger.start_cloud_logging
+        )
+        for country in countries:
+            country.household_pool = household_pool
 
     def _init_flask(self):
         """Initialise the Flask application."""
@@ -83,7 +199,13 @@ class PolicyEngine:
         for country in self.countries:
             for endpoint, endpoint_fn in country.api_endpoints.items():
                 endpoint_fn = add_params_and_caching(
-                    endpoint_fn, self.cache, self.logger
+                    endpoint_fn,
+                    self.cache,
+                    self.logger,
+                    self.scheduler,
+                    canonicalise=country.canonical_parameters,
+                    endpoint_name=f"{country.name}_{endpoint}",
+                    memo=self.memo,
                 )
                 endpoint_fn = logged_endpoint(endpoint_fn, self.logger)
                 self.app.route(
@@ -96,4 +218,6 @@ class PolicyEngine:
 
     def _init_logger(self):
         """Initialise the logger for the PolicyEngine API."""
-        self.logger = PolicyEngineLogger(local=self.debug_mode)
+        self.logger = PolicyEngineLogger(
+            local=self.debug_mode, start_cloud_logging=False
+        )
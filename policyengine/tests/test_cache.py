@@ -0,0 +1,167 @@
+from time import sleep
+from google.api_core.exceptions import NotFound
+from policyengine.web_server.serialisation import ResultCodec
+from policyengine.web_server.cache import (
+    DiskCache,
+    LayeredCache,
+    LRUStore,
+    PolicyEngineCache,
+)
+from policyengine.web_server.tasks import PolicyEngineTask
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    def download_as_string(self) -> bytes:
+        self.bucket.downloads += 1
+        if self.name not in self.bucket.blobs:
+            raise NotFound(self.name)
+        return self.bucket.blobs[self.name]
+
+    def upload_from_string(self, data: bytes):
+        self.bucket.uploads += 1
+        self.bucket.blobs[self.name] = data
+
+
+class FakeBucket:
+    """An in-memory stand-in for a Google Cloud Storage bucket, counting requests."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = 0
+        self.uploads = 0
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+def create_cache(**kwargs):
+    bucket = FakeBucket()
+    storage = PolicyEngineCache("test", bucket=bucket)
+    return LayeredCache(storage, LRUStore(**kwargs)), bucket
+
+
+def test_completed_results_served_from_memory():
+    cache, bucket = create_cache()
+    cache.set(dict(a=1), "endpoint", dict(status="completed", value=1))
+    for _ in range(3):
+        assert cache.get(dict(a=1), "endpoint")["value"] == 1
+    assert bucket.uploads == 1
+    assert bucket.downloads == 0
+
+
+def test_misses_fall_through_to_storage():
+    cache, bucket = create_cache()
+    assert cache.get(dict(a=1), "endpoint") is None
+    assert bucket.downloads == 1
+    # Results stored by another instance are read once, then kept in memory.
+    PolicyEngineCache("test", bucket=bucket).set(
+        dict(a=1), "endpoint", dict(status="completed", value=1)
+    )
+    assert cache.get(dict(a=1), "endpoint")["value"] == 1
+    assert cache.get(dict(a=1), "endpoint")["value"] == 1
+    assert bucket.downloads == 2
+
+
+def test_in_progress_results_expire():
+    cache, bucket = create_cache(in_progress_ttl=0.01)
+    cache.set(dict(a=1), "endpoint", dict(status="in_progress"))
+    assert cache.get(dict(a=1), "endpoint")["status"] == "in_progress"
+    assert bucket.downloads == 0
+    sleep(0.02)
+    PolicyEngineCache("test", bucket=bucket).set(
+        dict(a=1), "endpoint", dict(status="completed", value=1)
+    )
+    assert cache.get(dict(a=1), "endpoint")["status"] == "completed"
+    assert bucket.downloads == 1
+
+
+def test_least_recently_used_results_evicted():
+    result = dict(status="completed", value="x" * 100)
+    cache, bucket = create_cache(max_size=300)
+    cache.set(dict(a=1), "endpoint", result)
+    cache.set(dict(a=2), "endpoint", result)
+    cache.get(dict(a=1), "endpoint")
+    cache.set(dict(a=3), "endpoint", result)
+    assert cache.memory.size <= 300
+    cache.get(dict(a=1), "endpoint")
+    cache.get(dict(a=3), "endpoint")
+    assert bucket.downloads == 0
+    cache.get(dict(a=2), "endpoint")
+    assert bucket.downloads == 1
+
+
+def test_memory_sizes_measured_while_encoding():
+    def size_of(result):
+        raise AssertionError("Results shouldn't be serialised again.")
+
+    cache, bucket = create_cache(size_of=size_of)
+    result = dict(status="completed", value="x" * 100)
+    cache.set(dict(a=1), "endpoint", result)
+    PolicyEngineCache("test", bucket=bucket).set(dict(a=2), "endpoint", result)
+    assert cache.get(dict(a=2), "endpoint") == result
+    assert cache.memory.size == 2 * len(ResultCodec("json").encode(result))
+
+
+def test_codecs_round_trip():
+    result = dict(status="completed", values=[1.5, None, "a", dict(b=True)])
+    for marker in ("json", "json.gz"):
+        codec = ResultCodec(marker)
+        assert codec.decode(codec.encode(result)) == result
+
+
+def test_disk_cache_persists_and_evicts(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    result = dict(status="completed", value=[i * i for i in range(100)])
+    # Room for three compressed results.
+    cache = DiskCache("test", path, max_size=1_000)
+    for i in range(3):
+        cache.set(dict(a=i), "endpoint", result)
+        sleep(0.01)
+    cache.get(dict(a=0), "endpoint")
+    cache.set(dict(a=3), "endpoint", result)
+    # A new instance (e.g. in another worker) shares the stored results.
+    cache = DiskCache("test", path, max_size=1_000)
+    assert cache.get(dict(a=3), "endpoint") == result
+    assert cache.get(dict(a=0), "endpoint") == result
+    assert cache.get(dict(a=1), "endpoint") is None
+
+
+def test_disk_cache_reads_results_of_other_codecs(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    result = dict(status="completed", value=[1, 2, 3])
+    DiskCache("test", path, codec=ResultCodec("json")).set(
+        dict(a=1), "endpoint", result
+    )
+    cache = DiskCache("test", path, codec=ResultCodec("json.gz"))
+    assert cache.get(dict(a=1), "endpoint") == result
+    cache.set(dict(a=2), "endpoint", result)
+    assert cache.get(dict(a=2), "endpoint") == result
+
+
+def test_results_of_previous_codec_readable():
+    bucket = FakeBucket()
+    result = dict(status="completed", value=1)
+    PolicyEngineCache("test", bucket=bucket).set(dict(a=1), "endpoint", result)
+    cache = PolicyEngineCache("test", bucket=bucket, codec=ResultCodec("json"))
+    assert cache.get(dict(a=1), "endpoint") == result
+    assert cache.get(dict(a=2), "endpoint") is None
+
+
+def test_partial_results_stored_part_by_part():
+    cache, bucket = create_cache()
+    task = PolicyEngineTask(None, dict(a=1), "endpoint", {}, cache, None)
+    task.report_progress(dict(metrics=1))
+    task.report_progress(dict(metrics=1, chart=[1, 2]))
+    task.report_progress(dict(metrics=2, chart=[1, 2]))
+    # Each changed part, then the manifest, per report.
+    assert bucket.uploads == 6
+    # Another server instance reads the parts stored so far.
+    other = PolicyEngineCache("test", bucket=bucket)
+    assert other.get_partial_result(dict(a=1), "endpoint") == dict(
+        metrics=2, chart=[1, 2]
+    )
+    assert other.get_partial_result(dict(a=2), "endpoint") == {}
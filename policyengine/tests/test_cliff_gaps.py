@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from policyengine.impact.household.earnings_sweep import cliff_intervals
+
+NUM_POINTS = 2_001
+
+
+def looped_cliff_intervals(earnings: np.ndarray, net_income: np.ndarray):
+    """The looped implementation the running maximum replaced, kept as a reference."""
+    diffs = np.diff(net_income, append=np.inf)
+    cliffs = np.where(diffs < 0)[0]
+    start = []
+    end = []
+    for cliff in cliffs:
+        earnings_before_cliff = earnings[cliff]
+        # Skip if embedded in a larger cliff.
+        if len(end) > 0:
+            if earnings_before_cliff < end[-1]:
+                continue
+        net_income_before_cliff = net_income[cliff]
+        ix_first_exceed_cliff = np.argmax(net_income > net_income_before_cliff)
+        earnings_after_cliff = earnings[ix_first_exceed_cliff]
+        start.append(earnings_before_cliff)
+        end.append(earnings_after_cliff)
+    return list(zip(start, end))
+
+
+def synthetic_budget(seed: int):
+    random = np.random.default_rng(seed)
+    earnings = np.cumsum(random.uniform(50, 150, NUM_POINTS))
+    # Small integer steps give ties, plateaus and many small cliffs.
+    net_income = np.cumsum(random.integers(-3, 4, NUM_POINTS)).astype(float)
+    if seed % 2:
+        # Benefit phase-outs: steady growth with occasional drops.
+        net_income = 0.5 * earnings - 500 * np.cumsum(
+            random.uniform(size=NUM_POINTS) < 0.02
+        )
+    if seed % 3 == 0:
+        # End on a cliff net income never recovers from.
+        net_income[-NUM_POINTS // 10 :] = net_income.min() - 1
+    return earnings, net_income
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_cliff_intervals_match_loop(seed: int):
+    earnings, net_income = synthetic_budget(seed)
+    assert cliff_intervals(earnings, net_income) == looped_cliff_intervals(
+        earnings, net_income
+    )
+
+
+@pytest.mark.parametrize(
+    "net_income",
+    [
+        [],
+        [1],
+        [1, 2, 3],
+        [3, 2, 1],
+        [0, 10, 10, 5, 10, 5, 12],
+        [0, 10, 5, 8, 3, 9],
+        [0, 10, 5, 8, 3, 12],
+        [5, 5, 5, 4, 5, 5, 6],
+    ],
+)
+def test_cliff_intervals_match_loop_on_edge_cases(net_income: list):
+    net_income = np.array(net_income, dtype=float)
+    earnings = np.arange(len(net_income)) * 100.0
+    assert cliff_intervals(earnings, net_income) == looped_cliff_intervals(
+        earnings, net_income
+    )
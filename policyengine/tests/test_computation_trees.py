@@ -0,0 +1,47 @@
+from policyengine_core.periods import period
+from policyengine_core.tracers import TraceNode
+from policyengine.country.openfisca.computation_trees import TraceGraph
+
+
+def trace_node(name: str, *children: TraceNode) -> TraceNode:
+    return TraceNode(
+        name, period("2022"), children=list(children), value=[1.0]
+    )
+
+
+def create_graph() -> TraceGraph:
+    # Benefits use income tax, which is computed under net income first,
+    # then served from the simulation's cache (so traced without children).
+    return TraceGraph(
+        [
+            trace_node(
+                "net_income",
+                trace_node("income_tax", trace_node("earnings")),
+                trace_node(
+                    "benefits", trace_node("income_tax"), trace_node("age")
+                ),
+            )
+        ]
+    )
+
+
+def test_shared_dependency_is_not_a_leaf():
+    assert create_graph().leaf_nodes() == ["earnings", "age"]
+
+
+def test_shared_dependency_listed_once():
+    assert create_graph().dependencies() == [
+        "net_income",
+        "income_tax",
+        "earnings",
+        "benefits",
+        "age",
+    ]
+
+
+def test_shared_dependency_expanded_once_in_trees():
+    (tree,) = create_graph().computation_trees()
+    income_tax, benefits = tree["children"]
+    assert income_tax["children"][0]["name"] == "earnings"
+    assert benefits["children"][0]["name"] == "income_tax"
+    assert benefits["children"][0]["children"] == []
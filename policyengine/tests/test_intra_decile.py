@@ -0,0 +1,104 @@
+import os
+from time import time
+import numpy as np
+import pandas as pd
+import pytest
+from microdf import MicroSeries
+from policyengine.impact.population.charts.intra_decile import (
+    NAMES,
+    intra_decile_outcome_shares,
+)
+
+NUM_PEOPLE = 5_000
+
+# The benchmark compares both implementations at the size of a national
+# dataset, and only runs if this environment variable is set.
+BENCHMARK_VARIABLE = "POLICYENGINE_BENCHMARK"
+BENCHMARK_NUM_PEOPLE = 400_000
+
+
+def looped_outcome_shares(
+    rel_gain: MicroSeries, decile: MicroSeries
+) -> pd.DataFrame:
+    """The masked-loop implementation the histogram replaced, kept as a reference."""
+    l = []
+    BANDS = (None, 0.05, 1e-3, -1e-3, -0.05, None)
+    for upper, lower, name in zip(BANDS[:-1], BANDS[1:], NAMES):
+        fractions = []
+        for j in range(1, 11):
+            subset = rel_gain[decile == j]
+            if lower is not None:
+                subset = subset[rel_gain > lower]
+            if upper is not None:
+                subset = subset[rel_gain <= upper]
+            fractions += [subset.count() / rel_gain[decile == j].count()]
+        tmp = pd.DataFrame(
+            {
+                "fraction": fractions,
+                "decile": list(map(str, range(1, 11))),
+                "outcome": name,
+            }
+        )
+        l.append(tmp)
+        subset = rel_gain
+        if lower is not None:
+            subset = subset[rel_gain > lower]
+        if upper is not None:
+            subset = subset[rel_gain <= upper]
+        all_row = pd.DataFrame(
+            {
+                "fraction": [subset.count() / rel_gain.count()],
+                "decile": "All",
+                "outcome": name,
+            }
+        )
+        l.append(all_row)
+    return pd.concat(l).reset_index()
+
+
+def synthetic_population(num_people: int = NUM_PEOPLE, seed: int = 0):
+    random = np.random.default_rng(seed)
+    weights = random.uniform(100, 5_000, num_people)
+    income = MicroSeries(random.lognormal(10, 1, num_people), weights=weights)
+    decile = income.decile_rank()
+    # Mix no-change, small and large changes, including band edges exactly.
+    rel_gain = np.where(
+        random.uniform(size=num_people) < 0.3,
+        0,
+        random.normal(0, 0.05, num_people),
+    )
+    edges = random.choice([-0.05, -1e-3, 1e-3, 0.05], num_people)
+    rel_gain = np.where(
+        random.uniform(size=num_people) < 0.05, edges, rel_gain
+    )
+    return MicroSeries(rel_gain, weights=weights), decile
+
+
+def test_intra_decile_histogram_matches_loop():
+    rel_gain, decile = synthetic_population()
+    expected = looped_outcome_shares(rel_gain, decile)
+    result = intra_decile_outcome_shares(
+        rel_gain.values, decile.values, np.array(rel_gain.weights)
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.skipif(
+    not os.environ.get(BENCHMARK_VARIABLE),
+    reason=f"Benchmarks run only if {BENCHMARK_VARIABLE} is set.",
+)
+def test_intra_decile_benchmark():
+    rel_gain, decile = synthetic_population(BENCHMARK_NUM_PEOPLE)
+    start_time = time()
+    expected = looped_outcome_shares(rel_gain, decile)
+    looped_time = time() - start_time
+    start_time = time()
+    result = intra_decile_outcome_shares(
+        rel_gain.values, decile.values, np.array(rel_gain.weights)
+    )
+    histogram_time = time() - start_time
+    print(
+        f"Intra-decile outcome shares of {BENCHMARK_NUM_PEOPLE:,} people: "
+        f"{looped_time:.3f}s looped, {histogram_time:.3f}s histogram."
+    )
+    pd.testing.assert_frame_equal(result, expected)
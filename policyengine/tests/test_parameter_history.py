@@ -0,0 +1,110 @@
+import pytest
+from policyengine_core.entities import build_entity
+from policyengine_core.parameters import ParameterNode
+from policyengine_core.taxbenefitsystems import TaxBenefitSystem
+from policyengine.country.openfisca.parameters import (
+    ParameterMetadataHistory,
+    build_parameters,
+)
+
+Person = build_entity("person", "people", "Person", is_person=True)
+
+PARAMETERS = {
+    "benefit": {
+        "amount": {
+            "description": "Benefit amount",
+            "metadata": {"unit": "currency-GBP"},
+            "values": {
+                "2010-01-01": 100,
+                "2016-04-06": 120,
+                "2021-04-06": 140,
+            },
+        },
+        "uncapped": {
+            "description": "Uncapped benefit amount",
+            "values": {"2010-01-01": 0.5, "2018-01-01": float("inf")},
+        },
+        "introduced": {
+            "description": "Benefit introduced later",
+            "values": {"2015-01-01": True},
+        },
+    },
+    "tax": {
+        "scale": {
+            "description": "Income tax",
+            "metadata": {
+                "type": "marginal_rate",
+                "threshold_unit": "currency-GBP",
+                "rate_unit": "/1",
+            },
+            "brackets": [
+                {
+                    "threshold": {"values": {"2010-01-01": 0}},
+                    "rate": {"values": {"2010-01-01": 0.2}},
+                },
+                {
+                    "threshold": {
+                        "values": {"2010-01-01": 50_000, "2019-01-01": 60_000}
+                    },
+                    "rate": {"values": {"2010-01-01": 0.4}},
+                },
+                {
+                    # A bracket only in force for some dates.
+                    "threshold": {
+                        "values": {"2014-01-01": 150_000, "2020-01-01": None}
+                    },
+                    "rate": {"values": {"2014-01-01": 0.45}},
+                },
+            ],
+        },
+    },
+    "household_type": {
+        # An Enum parameter with no value at the current date.
+        "description": "Household type",
+        "metadata": {"value_type": "Enum"},
+        "values": {"2012-01-01": ["COUPLE"], "2017-01-01": None},
+    },
+}
+
+DATES = [
+    "2009-06-01",
+    "2010-01-01",
+    "2013-05-01",
+    "2014-01-01",
+    "2016-04-06",
+    "2018-07-01",
+    "2020-01-01",
+    "2022-01-01",
+]
+
+
+class System(TaxBenefitSystem):
+    def __init__(self):
+        super().__init__([Person])
+        self.parameters = ParameterNode("", data=PARAMETERS)
+
+
+@pytest.fixture(scope="module")
+def system():
+    return System()
+
+
+@pytest.fixture(scope="module")
+def history(system):
+    return ParameterMetadataHistory(system)
+
+
+@pytest.mark.parametrize("date", DATES)
+def test_history_matches_build_parameters(system, history, date):
+    expected = build_parameters(system.clone(), date)
+    assert history.build(date) == expected
+
+
+def test_enum_parameter_without_current_value(history):
+    assert history.build("2013-05-01")["household_type"]["value"] == "COUPLE"
+    assert "household_type" not in history.build("2022-01-01")
+
+
+def test_history_leaves_system_unchanged(system, history):
+    history.build("2022-01-01")
+    assert len(system.parameters.tax.scale.brackets) == 3
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+import policyengine.country.country as country_module
+from policyengine.country.country import PolicyEngineCountry
+
+CURRENT_VALUES = dict(basic_rate=0.2, personal_allowance=12_570)
+
+
+def canonical_parameters(parameters: dict) -> dict:
+    """Leaves out parameters set to their current value, as reforms do."""
+    return {
+        key: value
+        for key, value in parameters.items()
+        if CURRENT_VALUES.get(key) != value
+    }
+
+
+def test_breakdown_depends_only_on_canonical_parameters(monkeypatch):
+    breakdown_parameters = []
+
+    def get_breakdown(country, parameters: dict, *args, **kwargs) -> dict:
+        breakdown_parameters.append(parameters)
+        return {}
+
+    monkeypatch.setattr(
+        country_module, "get_breakdown_and_chart_per_provision", get_breakdown
+    )
+    country = SimpleNamespace(
+        canonical_parameters=canonical_parameters,
+        create_microsimulations=lambda parameters: (None, None),
+        results_config=None,
+    )
+    # The same cache key, one with a provision which changes nothing.
+    for parameters in (
+        dict(basic_rate=0.25),
+        dict(basic_rate=0.25, personal_allowance=12_570),
+    ):
+        PolicyEngineCountry.population_breakdown(country, parameters)
+    assert breakdown_parameters == [dict(basic_rate=0.25)] * 2
@@ -0,0 +1,89 @@
+from threading import Event, Thread
+from time import sleep
+from policyengine.web_server.tasks import (
+    PolicyEngineTask,
+    ProcessTaskExecutor,
+    TaskScheduler,
+    ThreadTaskExecutor,
+)
+
+
+class SlowCache:
+    """Takes a while to store queued markers, as a storage bucket would."""
+
+    def set(self, params: dict, endpoint: str, result: dict):
+        if result["status"] == "queued":
+            sleep(0.05)
+
+    def get_name(self, params: dict, endpoint: str) -> str:
+        return endpoint
+
+
+class PartialResultCache(SlowCache):
+    """Records the parts of partial results stored."""
+
+    def __init__(self):
+        self.parts = {}
+
+    def set_partial_result(
+        self, params: dict, endpoint: str, parts: dict, manifest: dict
+    ):
+        self.parts.update(parts)
+
+
+class SilentLogger:
+    def log(self, **data):
+        pass
+
+
+def test_concurrent_submissions_respect_queue_length():
+    release = Event()
+
+    def endpoint(params: dict) -> dict:
+        release.wait()
+        return {}
+
+    def create_task(name: str) -> PolicyEngineTask:
+        return PolicyEngineTask(
+            endpoint, {}, name, {}, SlowCache(), SilentLogger()
+        )
+
+    scheduler = TaskScheduler(ThreadTaskExecutor(), 1, max_queue_length=4)
+    # Occupy the only dispatcher, so that submitted tasks stay queued.
+    scheduler.submit("running", create_task("running"))
+    sleep(0.2)
+    statuses = []
+    submissions = [
+        Thread(
+            target=lambda name=f"task_{i}": statuses.append(
+                scheduler.submit(name, create_task(name))
+            )
+        )
+        for i in range(20)
+    ]
+    for submission in submissions:
+        submission.start()
+    for submission in submissions:
+        submission.join()
+    release.set()
+    assert sum(status is not None for status in statuses) == 4
+    assert len(scheduler.queue) <= 4
+
+
+def test_partial_results_of_worker_processes_stored():
+    def endpoint(params: dict, progress) -> dict:
+        progress(dict(metrics=1))
+        # Leaves time for the partial result to reach the server process.
+        sleep(0.5)
+        return dict(metrics=1, chart=2)
+
+    endpoint._reports_progress = True
+    executor = ProcessTaskExecutor(1)
+    executor.register(endpoint, SilentLogger())
+    cache = PartialResultCache()
+    task = PolicyEngineTask(
+        endpoint, {}, "endpoint", {}, cache, SilentLogger()
+    )
+    executor.run(task)
+    assert cache.parts == dict(metrics=1)
+    assert task.result == dict(metrics=1, chart=2, status="completed")
@@ -1,19 +1,27 @@
 import json
-from multiprocessing import Process
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock, local
 from time import time
-from typing import Callable
+from typing import Callable, Optional, Tuple
 from flask import request, make_response
-from threading import Thread
-import traceback
 from policyengine.web_server.logging import PolicyEngineLogger
+from policyengine.web_server.serialisation import ResultCodec
+from policyengine.web_server.tasks import (
+    PolicyEngineTask,
+    TaskScheduler,
+    TaskStatus,
+    ThreadTaskExecutor,
+)
 from typing import Dict, Any
 import hashlib
 import json
 
 
 def dict_hash(dictionary: Dict[str, Any]) -> str:
-    """MD5 hash of a dictionary."""
-    dhash = hashlib.md5()
+    """BLAKE2 hash of a dictionary."""
+    dhash = hashlib.blake2b(digest_size=16)
     # We need to sort arguments so {'a': 1, 'b': 2} is
     # the same as {'b': 2, 'a': 1}
     encoded = json.dumps(dictionary, sort_keys=True).encode()
@@ -34,24 +42,63 @@ def cached_endpoint(f: Callable) -> Callable:
     return f
 
 
-class TaskStatus:
-    QUEUED = "queued"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
+def reports_progress(f: Callable) -> Callable:
+    """Marks a cached endpoint as accepting a `progress` function, which it calls with partial results while running. Partial results are stored in the cache part by part, and returned to requests until the endpoint completes.
+
+    Args:
+        f (Callable): The function.
+
+    Returns:
+        Callable: The function with metadata added.
+    """
+    setattr(f, "_reports_progress", True)
+    return f
+
+
+def memoised_endpoint(f: Callable) -> Callable:
+    """Marks a function as a memoised endpoint, whose results are returned immediately and kept in memory for identical requests.
+
+    Args:
+        f (Callable): The function.
+
+    Returns:
+        Callable: The function with metadata added.
+    """
+    setattr(f, "_memoised_endpoint", True)
+    return f
 
 
 class PolicyEngineCache:
-    def __init__(self, version, bucket_name: str = None):
+    def __init__(
+        self,
+        version,
+        bucket_name: str = None,
+        bucket=None,
+        codec: ResultCodec = None,
+        fallback_markers: Tuple[str, ...] = ("json.gz",),
+    ):
         """Initialises the cache.
 
         Args:
             version (str): The version of the API.
-            bucket (google.cloud.Bucket): The Google Cloud bucket.
+            bucket_name (str): The name of the Google Cloud Storage bucket.
+            bucket (google.cloud.storage.Bucket, optional): The bucket to use, instead of connecting to the bucket named.
+            codec (ResultCodec, optional): The encoding of stored results. Defaults to gzip-compressed JSON.
+            fallback_markers (Tuple[str, ...], optional): The markers of other encodings results may have been stored with (e.g. before changing the codec), tried in order when no result is stored with `codec`. Defaults to gzip-compressed JSON.
         """
-        from google.cloud import storage
+        if bucket is None:
+            from google.cloud import storage
 
-        self.bucket = storage.Client().get_bucket(bucket_name)
+            bucket = storage.Client().get_bucket(bucket_name)
+        self.bucket = bucket
         self.version = version
+        self.codec = codec or ResultCodec()
+        self.codecs: Dict[str, ResultCodec] = {self.codec.marker: self.codec}
+        self.fallback_markers = tuple(
+            marker
+            for marker in fallback_markers
+            if marker != self.codec.marker
+        )
 
     def get_name(self, params: dict, endpoint: str) -> str:
         """Gets the key representing a request in the cache.
@@ -73,12 +120,9 @@ class PolicyEngineCache:
             endpoint (str): The endpoint name.
 
         Returns:
-            dict: _description_
+            dict: The cached result, or None if the request isn't cached.
         """
-        request_id = self.get_name(params, endpoint)
-        blob = self.bucket.blob(request_id + ".json")
-        if blob.exists():
-            return json.loads(blob.download_as_string())
+        return self._get(self.get_name(params, endpoint))
 
     def set(self, params: dict, endpoint: str, result: dict) -> None:
         """Sets a result in the cache.
@@ -88,9 +132,82 @@ class PolicyEngineCache:
             endpoint (str): The endpoint name.
             result (dict): The API result.
         """
-        request_id = self.get_name(params, endpoint)
-        blob = self.bucket.blob(request_id + ".json")
-        blob.upload_from_string(json.dumps(result))
+        self._set(self.get_name(params, endpoint), result)
+
+    def get_partial_result(self, params: dict, endpoint: str) -> dict:
+        """Gets the parts of an unfinished result stored so far (see `set_partial_result`).
+
+        Args:
+            params (dict): The parameters of the request.
+            endpoint (str): The endpoint name.
+
+        Returns:
+            dict: The partial result, empty if no parts are stored.
+        """
+        manifest = self.get(params, f"{endpoint}/manifest")
+        if manifest is None:
+            return {}
+        partial_result = {}
+        for key, report in manifest["parts"].items():
+            part = self.get(params, f"{endpoint}/{key}/{report}")
+            if part is not None:
+                partial_result[key] = part["value"]
+        return partial_result
+
+    def set_partial_result(
+        self,
+        params: dict,
+        endpoint: str,
+        parts: dict,
+        manifest: Dict[str, int],
+    ) -> None:
+        """Stores the parts of an unfinished result which changed since it was last reported (e.g. newly computed charts), then the manifest listing every part stored.
+
+        Each part is stored under its own key, named with the number of the report it changed in, so that stored parts never change and unchanged parts aren't stored again.
+
+        Args:
+            params (dict): The parameters of the request.
+            endpoint (str): The endpoint name.
+            parts (dict): The changed parts of the result.
+            manifest (Dict[str, int]): The number of the report each part of the result last changed in.
+        """
+        for key, value in parts.items():
+            self.set(
+                params, f"{endpoint}/{key}/{manifest[key]}", dict(value=value)
+            )
+        self.set(
+            params,
+            f"{endpoint}/manifest",
+            dict(status=TaskStatus.IN_PROGRESS, parts=manifest),
+        )
+
+    def _get(self, name: str) -> Optional[dict]:
+        return self._get_with_size(name)[0]
+
+    def _get_with_size(self, name: str) -> Tuple[Optional[dict], int]:
+        from google.api_core.exceptions import NotFound
+
+        for marker in (self.codec.marker,) + self.fallback_markers:
+            try:
+                data = self.bucket.blob(
+                    f"{name}.{marker}"
+                ).download_as_string()
+            except NotFound:
+                continue
+            if marker not in self.codecs:
+                self.codecs[marker] = ResultCodec(marker)
+            return self.codecs[marker].decode_with_size(data)
+        return None, 0
+
+    def _set(self, name: str, result: dict) -> None:
+        self._set_with_size(name, result)
+
+    def _set_with_size(self, name: str, result: dict) -> int:
+        data, size = self.codec.encode_with_size(result)
+        self.bucket.blob(f"{name}.{self.codec.marker}").upload_from_string(
+            data
+        )
+        return size
 
 
 class LocalCache(PolicyEngineCache):
@@ -98,13 +215,102 @@ class LocalCache(PolicyEngineCache):
         self.cache = {}
         self.version = version
 
-    def get(self, params: dict, endpoint: str) -> dict:
-        request_id = self.get_name(params, endpoint)
-        return self.cache.get(request_id)
+    def _get(self, name: str) -> Optional[dict]:
+        return self.cache.get(name)
 
-    def set(self, params: dict, endpoint: str, result: dict) -> None:
-        request_id = self.get_name(params, endpoint)
-        self.cache[request_id] = result
+    def _set(self, name: str, result: dict) -> None:
+        self.cache[name] = result
+
+
+class DiskCache(PolicyEngineCache):
+    """A cache storing encoded results in a SQLite database, evicting the least recently used results beyond a total size.
+
+    SQLite's write-ahead log and locking make the database safe to share between several server processes.
+    """
+
+    def __init__(
+        self,
+        version,
+        path: Path,
+        max_size: int = 2**30,
+        codec: ResultCodec = None,
+    ):
+        """Initialises the cache.
+
+        Args:
+            version (str): The version of the API.
+            path (Path): The path of the SQLite database file.
+            max_size (int, optional): The maximum total size of stored results, in encoded bytes. Defaults to 1GB.
+            codec (ResultCodec, optional): The encoding of stored results. Defaults to gzip-compressed JSON. Each result is stored with the marker of its encoding, so results stored with other encodings stay readable.
+        """
+        self.version = version
+        self.path = Path(path)
+        self.max_size = max_size
+        self.codec = codec or ResultCodec()
+        self.codecs: Dict[str, ResultCodec] = {self.codec.marker: self.codec}
+        self.connections = local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (name TEXT PRIMARY KEY, codec TEXT NOT NULL, data BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+            )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection of the current thread."""
+        if not hasattr(self.connections, "connection"):
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.connections.connection = connection
+        return self.connections.connection
+
+    def _get(self, name: str) -> Optional[dict]:
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT codec, data FROM results WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE results SET accessed = ? WHERE name = ?",
+                (time(), name),
+            )
+        marker, data = row
+        if marker not in self.codecs:
+            self.codecs[marker] = ResultCodec(marker)
+        return self.codecs[marker].decode(data)
+
+    def _set(self, name: str, result: dict) -> None:
+        data = self.codec.encode(result)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (name, self.codec.marker, data, len(data), time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        (total_size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        excess = total_size - self.max_size
+        if excess <= 0:
+            return
+        evicted = []
+        for name, size in self.connection.execute(
+            "SELECT name, size FROM results ORDER BY accessed"
+        ):
+            evicted.append((name,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany(
+            "DELETE FROM results WHERE name = ?", evicted
+        )
 
 
 class DisabledCache(PolicyEngineCache):
@@ -113,117 +319,205 @@ class DisabledCache(PolicyEngineCache):
     set = lambda *args, **kwargs: None
 
 
-class PolicyEngineTask:
-    key: str
-    """A unique identifier for the task."""
+class LRUStore:
+    """A thread-safe in-memory store of results, evicting the least recently used results beyond a total size.
 
-    status: str = TaskStatus.QUEUED
-    """The status of the task."""
-
-    def mark_in_progress(self):
-        """Marks the task as in progress."""
-        self.status = TaskStatus.IN_PROGRESS
-
-    def mark_completed(self):
-        """Marks the task as completed."""
-        self.status = TaskStatus.COMPLETED
+    Results of tasks which haven't completed expire after a short time, so that progress made elsewhere (e.g. by another server instance) is picked up from the underlying cache.
+    """
 
     def __init__(
         self,
-        task: Callable,
-        params: dict,
-        endpoint: str,
-        kwargs: dict,
-        cache: PolicyEngineCache,
-        logger: PolicyEngineLogger,
+        max_size: int = 128 * 2**20,
+        in_progress_ttl: float = 5,
+        size_of: Callable[[Any], int] = None,
     ):
-        """Initialises the task.
+        """Initialises the store.
 
         Args:
-            task (Callable): The task.
-            params (dict): The parameters of the request.
-            endpoint (str): The endpoint name.
-            kwargs (dict): The keyword arguments of the request.
-            cache (PolicyEngineCache): The cache.
-            logger (PolicyEngineLogger): The logger.
+            max_size (int, optional): The maximum total size of stored results, in bytes of serialised results (e.g. JSON). Defaults to 128MB.
+            in_progress_ttl (float, optional): The number of seconds to keep results of unfinished tasks for. Defaults to 5.
+            size_of (Callable[[Any], int], optional): A function giving the size of a stored value, for values other than results (e.g. `lambda value: 1` to limit the number of values). Defaults to the length of the value as JSON.
         """
-        self.task = task
-        self.params = params
-        self.endpoint = endpoint
-        self.kwargs = kwargs
-        self.cache = cache
-        self.logger = logger
-
-    def execute(self):
-        """Executes the task."""
-        self.mark_in_progress()
-        # Ensure that if an endpoint modifies the params, it doesn't affect the cache key.
-        params_copy = json.loads(json.dumps(self.params))
-        self.cache.set(
-            params_copy,
-            self.endpoint,
-            {"status": TaskStatus.IN_PROGRESS},
-        )
-        start_time = time()
-        try:
-            result = self.task(params=self.params, **self.kwargs)
-        except Exception as e:
-            self.logger.log(
-                event="task_error",
-                endpoint=self.endpoint,
-                error=str(e),
-                full_trace=traceback.format_exc(),
-            )
-            result = {"status": "error", "error": str(e)}
-        duration = time() - start_time
-        self.logger.log(
-            event="endpoint_thread_completion",
-            endpoint=self.endpoint,
-            time=duration,
-            cache_key=self.cache.get_name(params_copy, self.endpoint),
+        self.max_size = max_size
+        self.in_progress_ttl = in_progress_ttl
+        self.size_of = size_of or (lambda result: len(json.dumps(result)))
+        self.size = 0
+        # Name -> (result, size, expiry time or None).
+        self.entries: "OrderedDict[str, Tuple[dict, int, float]]" = (
+            OrderedDict()
         )
-        self.cache.set(
-            params_copy,
-            self.endpoint,
-            {**result, "status": TaskStatus.COMPLETED},
+        self.lock = Lock()
+
+    def get(self, name: str) -> Optional[dict]:
+        """Gets a result, if stored and not expired.
+
+        Args:
+            name (str): The cache key.
+
+        Returns:
+            Optional[dict]: The result.
+        """
+        with self.lock:
+            if name not in self.entries:
+                return None
+            result, size, expiry = self.entries[name]
+            if expiry is not None and time() > expiry:
+                self._remove(name)
+                return None
+            self.entries.move_to_end(name)
+            return result
+
+    def set(self, name: str, result: dict, size: int = None) -> None:
+        """Stores a result, evicting older results if needed.
+
+        Args:
+            name (str): The cache key.
+            result (dict): The result.
+            size (int, optional): The size of the result, if already known (e.g. from encoding it for storage). Defaults to the size given by `size_of`.
+        """
+        if size is None:
+            size = self.size_of(result)
+        expiry = (
+            None
+            if not isinstance(result, dict)
+            or result.get("status") in (None, TaskStatus.COMPLETED)
+            else time() + self.in_progress_ttl
         )
-        self.mark_completed()
+        with self.lock:
+            if name in self.entries:
+                self._remove(name)
+            if size > self.max_size:
+                return
+            self.entries[name] = (result, size, expiry)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, name: str):
+        self.size -= self.entries.pop(name)[1]
+
+
+class LayeredCache(PolicyEngineCache):
+    """A cache serving results from memory where possible, in front of a slower cache (e.g. a storage bucket)."""
+
+    def __init__(self, storage: PolicyEngineCache, memory: LRUStore = None):
+        """Initialises the cache.
+
+        Args:
+            storage (PolicyEngineCache): The underlying storage bucket cache. Results are kept in memory with the size of their serialised form, measured while encoding them for the bucket.
+            memory (LRUStore, optional): The in-memory store. Defaults to one with default limits.
+        """
+        self.storage = storage
+        self.memory = memory or LRUStore()
+        self.version = storage.version
+
+    def _get(self, name: str) -> Optional[dict]:
+        result = self.memory.get(name)
+        if result is None:
+            result, size = self.storage._get_with_size(name)
+            if result is not None:
+                self.memory.set(name, result, size)
+        return result
+
+    def _set(self, name: str, result: dict) -> None:
+        size = self.storage._set_with_size(name, result)
+        self.memory.set(name, result, size)
 
 
 def add_params_and_caching(
-    fn: Callable, cache: PolicyEngineCache, logger: PolicyEngineLogger
+    fn: Callable,
+    cache: PolicyEngineCache,
+    logger: PolicyEngineLogger,
+    scheduler: TaskScheduler = None,
+    canonicalise: Callable[[dict], dict] = None,
+    endpoint_name: str = None,
+    memo: LRUStore = None,
 ) -> Callable:
-    """Adds request parameters to a function call under the variable `params` and caches the result if the caching decorator is present.
+    """Adds request parameters to a function call under the variable `params` and caches the result if the caching decorator is present, or memoises it if the memoisation decorator is present.
 
     Args:
         fn (Callable): The endpoint function defining behaviour.
         cache (PolicyEngineCache): The cache to lookup from and store results to.
         logger (PolicyEngineLogger): The logger to use to log timings.
+        scheduler (TaskScheduler, optional): The scheduler running cached endpoints. Defaults to one with its own thread workers.
+        canonicalise (Callable[[dict], dict], optional): A function putting request parameters in a canonical form, used to identify requests in the cache. The endpoint function still receives the original parameters.
+        endpoint_name (str, optional): The name identifying the endpoint in the cache. Defaults to the function name.
+        memo (LRUStore, optional): The store of memoised endpoint results. Defaults to one for this endpoint alone.
 
     Returns:
         Callable: The function with the Flask handling added.
     """
     should_cache = hasattr(fn, "_cached_endpoint")
     cache = cache if should_cache else None
+    should_memoise = hasattr(fn, "_memoised_endpoint")
+    has_progress = hasattr(fn, "_reports_progress")
+    endpoint_name = endpoint_name or fn.__name__
+    if should_memoise:
+        memo = memo or LRUStore()
+    if should_cache:
+        scheduler = scheduler or TaskScheduler(ThreadTaskExecutor())
+        scheduler.executor.register(fn, logger)
 
     def new_fn(*args, **kwargs):
         params = {**request.args, **(request.json or {})}
-        if should_cache:
-            cached_result = cache.get(params, fn.__name__)
-        else:
+        if not should_cache and not should_memoise:
             return fn(params=params, *args, **kwargs)
+        cache_params = params
+        if canonicalise is not None:
+            try:
+                cache_params = canonicalise(params)
+            except (KeyError, ValueError, TypeError, IndexError):
+                # Invalid parameters fail in the endpoint itself.
+                pass
+        if should_memoise:
+            name = f"{endpoint_name}-{dict_hash(cache_params)}"
+            result = memo.get(name)
+            if result is None:
+                # Endpoints may modify their parameters (and return them).
+                result = fn(
+                    params=json.loads(json.dumps(params)), *args, **kwargs
+                )
+                memo.set(name, result)
+            return result
+        # Queued and running tasks are tracked in memory, so check those
+        # before the (possibly remote) cache.
+        name = cache.get_name(cache_params, endpoint_name)
+        status = scheduler.get_status(name)
+        if status is not None:
+            return status
+        cached_result = cache.get(cache_params, endpoint_name)
         if cached_result is not None:
+            if (
+                has_progress
+                and cached_result.get("status") == TaskStatus.IN_PROGRESS
+            ):
+                # Running elsewhere (e.g. on another server instance).
+                return {
+                    **cache.get_partial_result(cache_params, endpoint_name),
+                    **cached_result,
+                }
             return cached_result
-        else:
-            result = {"status": TaskStatus.QUEUED}
-            cache.set(params, fn.__name__, result)
-            task = Thread(
-                target=PolicyEngineTask(
-                    fn, params, fn.__name__, kwargs, cache, logger
-                ).execute
+        status = scheduler.submit(
+            name,
+            PolicyEngineTask(
+                fn,
+                params,
+                endpoint_name,
+                kwargs,
+                cache,
+                logger,
+                cache_params=cache_params,
+            ),
+        )
+        if status is None:
+            return (
+                dict(
+                    status="error",
+                    error="Too many requests are queued. Please try again later.",
+                ),
+                429,
             )
-            task.start()
-            return result
+        return status
 
     new_fn.__name__ = fn.__name__
     return new_fn
@@ -21,18 +21,32 @@ class PolicyEngineLogger:
     """Whether to print log messages to the console as well as to a log file.
     """
 
-    def __init__(self, local: bool = True, print_to_console: bool = True):
+    def __init__(
+        self,
+        local: bool = True,
+        print_to_console: bool = True,
+        start_cloud_logging: bool = True,
+    ):
         self.local = local
-        if not local:
-            # Instantiates a client
-            client = google.cloud.logging.Client()
-
-            # Retrieves a Cloud Logging handler based on the environment
-            # you're running in and integrates the handler with the
-            # Python logging module. By default this captures all logs
-            # at INFO level and higher
-            client.setup_logging()
         self.print_to_console = print_to_console
+        if start_cloud_logging:
+            self.start_cloud_logging()
+
+    def start_cloud_logging(self):
+        """Sends logs from this process to Google Cloud, unless logging locally.
+
+        The Cloud Logging handler sends logs from a background thread, which processes forked afterwards don't inherit (along with any locks it holds). Servers forking worker processes start cloud logging after forking them, and in each worker.
+        """
+        if self.local:
+            return
+        # Instantiates a client
+        client = google.cloud.logging.Client()
+
+        # Retrieves a Cloud Logging handler based on the environment
+        # you're running in and integrates the handler with the
+        # Python logging module. By default this captures all logs
+        # at INFO level and higher
+        client.setup_logging()
 
     def log(self, *messages, **data: dict):
         """Log a message to the PolicyEngine server logs.
@@ -0,0 +1,112 @@
+"""
+Encodings of cached results, identified by a marker such as "json.gz" (JSON, gzip-compressed) used as the suffix of stored blob names.
+"""
+import gzip
+import json
+from typing import Callable, Dict, Tuple
+
+
+def _get_msgpack() -> Tuple[Callable, Callable]:
+    import msgpack
+
+    return (
+        lambda result: msgpack.packb(result, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+
+def _get_zstd() -> Tuple[Callable, Callable]:
+    import zstandard
+
+    # (De)compressor objects aren't thread-safe, so create one per call.
+    return (
+        lambda data: zstandard.ZstdCompressor(level=10).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+
+
+SERIALISERS: Dict[str, Callable[[], Tuple[Callable, Callable]]] = dict(
+    json=lambda: (
+        lambda result: json.dumps(result).encode(),
+        json.loads,
+    ),
+    msgpack=_get_msgpack,
+)
+"""Functions returning the (serialise, deserialise) pair of each serialisation format. Formats needing optional packages import them on first use."""
+
+COMPRESSORS: Dict[str, Callable[[], Tuple[Callable, Callable]]] = {
+    "": lambda: (lambda data: data, lambda data: data),
+    "gz": lambda: (
+        lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+        gzip.decompress,
+    ),
+    "zst": _get_zstd,
+}
+"""Functions returning the (compress, decompress) pair of each compression format. Formats needing optional packages import them on first use."""
+
+
+class ResultCodec:
+    """Converts results to and from bytes in a given serialisation and compression format."""
+
+    def __init__(self, marker: str = "json.gz"):
+        """Initialises the codec.
+
+        Args:
+            marker (str, optional): The serialisation format (json or msgpack), optionally followed by a dot and the compression format (gz or zst). Defaults to "json.gz".
+
+        Raises:
+            ValueError: If either format is unknown.
+            ImportError: If either format needs a package which isn't installed.
+        """
+        serialiser, _, compressor = marker.partition(".")
+        if serialiser not in SERIALISERS or compressor not in COMPRESSORS:
+            raise ValueError(f"Unknown result encoding {marker}.")
+        self.marker = marker
+        self.serialise, self.deserialise = SERIALISERS[serialiser]()
+        self.compress, self.decompress = COMPRESSORS[compressor]()
+
+    def encode(self, result: dict) -> bytes:
+        """Encodes a result.
+
+        Args:
+            result (dict): The result.
+
+        Returns:
+            bytes: The encoded result.
+        """
+        return self.encode_with_size(result)[0]
+
+    def encode_with_size(self, result: dict) -> Tuple[bytes, int]:
+        """Encodes a result, also measuring its size.
+
+        Args:
+            result (dict): The result.
+
+        Returns:
+            Tuple[bytes, int]: The encoded result, and its size before compression.
+        """
+        serialised = self.serialise(result)
+        return self.compress(serialised), len(serialised)
+
+    def decode(self, data: bytes) -> dict:
+        """Decodes a result.
+
+        Args:
+            data (bytes): The encoded result.
+
+        Returns:
+            dict: The result.
+        """
+        return self.decode_with_size(data)[0]
+
+    def decode_with_size(self, data: bytes) -> Tuple[dict, int]:
+        """Decodes a result, also measuring its size.
+
+        Args:
+            data (bytes): The encoded result.
+
+        Returns:
+            Tuple[dict, int]: The result, and its size before compression.
+        """
+        serialised = self.decompress(data)
+        return self.deserialise(serialised), len(serialised)
@@ -0,0 +1,414 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from itertools import count
+from multiprocessing import get_context
+from multiprocessing.queues import SimpleQueue
+from threading import Condition, Lock, Thread
+from time import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import traceback
+from policyengine.web_server.logging import PolicyEngineLogger
+
+
+class TaskStatus:
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
+class PolicyEngineTask:
+    key: str
+    """A unique identifier for the task."""
+
+    status: str = TaskStatus.QUEUED
+    """The status of the task."""
+
+    partial_result: dict = None
+    """The latest partial result reported by a running task."""
+
+    partial_manifest: Dict[str, int] = None
+    """The number of the report each part of the partial result last changed in."""
+
+    reports: int = 0
+    """The number of partial results reported."""
+
+    result: dict = None
+    """The result of the completed task, as stored in the cache."""
+
+    def mark_in_progress(self):
+        """Marks the task as in progress."""
+        self.status = TaskStatus.IN_PROGRESS
+
+    def mark_completed(self):
+        """Marks the task as completed."""
+        self.status = TaskStatus.COMPLETED
+
+    def __init__(
+        self,
+        task: Callable,
+        params: dict,
+        endpoint: str,
+        kwargs: dict,
+        cache: "PolicyEngineCache",
+        logger: PolicyEngineLogger,
+        cache_params: dict = None,
+    ):
+        """Initialises the task.
+
+        Args:
+            task (Callable): The task.
+            params (dict): The parameters of the request.
+            endpoint (str): The endpoint name.
+            kwargs (dict): The keyword arguments of the request.
+            cache (PolicyEngineCache): The cache.
+            logger (PolicyEngineLogger): The logger.
+            cache_params (dict, optional): The parameters identifying the request in the cache. Defaults to the request parameters.
+        """
+        self.task = task
+        self.params = params
+        self.endpoint = endpoint
+        self.kwargs = kwargs
+        self.cache = cache
+        self.logger = logger
+        # Ensure that if an endpoint modifies the params, it doesn't affect the cache key.
+        self.cache_params = json.loads(
+            json.dumps(params if cache_params is None else cache_params)
+        )
+
+    def mark_queued_in_cache(self):
+        """Stores a queued status in the cache, so that other processes sharing the cache report this task rather than starting it again."""
+        self.cache.set(
+            self.cache_params,
+            self.endpoint,
+            {"status": TaskStatus.QUEUED},
+        )
+
+    def start(self):
+        """Marks the task as in progress, both locally and in the cache."""
+        self.mark_in_progress()
+        self.cache.set(
+            self.cache_params,
+            self.endpoint,
+            {"status": TaskStatus.IN_PROGRESS},
+        )
+        self.start_time = time()
+
+    def report_progress(self, partial_result: dict):
+        """Keeps a partial result of the running task, which the scheduler returns to requests for it, and stores the parts which changed since the last report in the cache, for other processes sharing it.
+
+        Args:
+            partial_result (dict): The partial result.
+        """
+        previous = self.partial_result or {}
+        self.reports += 1
+        self.partial_manifest = dict(self.partial_manifest or {})
+        parts = {}
+        for key, value in partial_result.items():
+            if key not in previous or previous[key] != value:
+                parts[key] = value
+                self.partial_manifest[key] = self.reports
+        self.cache.set_partial_result(
+            self.cache_params, self.endpoint, parts, self.partial_manifest
+        )
+        self.partial_result = partial_result
+
+    def run(self, progress: Callable[[dict], None] = None) -> dict:
+        """Runs the endpoint function.
+
+        Args:
+            progress (Callable[[dict], None], optional): The function receiving partial results, for endpoints reporting them. Defaults to `report_progress`.
+
+        Returns:
+            dict: The endpoint result, or an error result if the endpoint raised an exception.
+        """
+        kwargs = self.kwargs
+        if hasattr(self.task, "_reports_progress"):
+            kwargs = {**kwargs, "progress": progress or self.report_progress}
+        try:
+            return self.task(params=self.params, **kwargs)
+        except Exception as e:
+            self.logger.log(
+                event="task_error",
+                endpoint=self.endpoint,
+                error=str(e),
+                full_trace=traceback.format_exc(),
+            )
+            return {"status": "error", "error": str(e)}
+
+    def complete(self, result: dict):
+        """Stores the result of the task in the cache.
+
+        Args:
+            result (dict): The endpoint result.
+        """
+        duration = time() - self.start_time
+        self.logger.log(
+            event="endpoint_thread_completion",
+            endpoint=self.endpoint,
+            time=duration,
+            cache_key=self.cache.get_name(self.cache_params, self.endpoint),
+        )
+        self.result = {**result, "status": TaskStatus.COMPLETED}
+        self.cache.set(self.cache_params, self.endpoint, self.result)
+        self.mark_completed()
+
+    def execute(self):
+        """Executes the task."""
+        self.start()
+        self.complete(self.run())
+
+
+class TaskExecutor(ABC):
+    """Base class for a backend running cached endpoint tasks."""
+
+    def register(self, fn: Callable, logger: PolicyEngineLogger):
+        """Registers an endpoint function whose tasks this executor will run. All endpoints must be registered before the first task is run.
+
+        Args:
+            fn (Callable): The endpoint function.
+            logger (PolicyEngineLogger): The logger.
+        """
+
+    @abstractmethod
+    def run(self, task: PolicyEngineTask):
+        """Runs a task to completion, storing its result in the cache.
+
+        Args:
+            task (PolicyEngineTask): The task.
+        """
+
+
+class ThreadTaskExecutor(TaskExecutor):
+    """Runs each task in the calling thread."""
+
+    def run(self, task: PolicyEngineTask):
+        task.execute()
+
+
+# Endpoint functions and their loggers, registered before the worker processes
+# are forked so that each worker inherits them (bound methods of a country
+# aren't picklable).
+_REGISTERED_ENDPOINTS: List[Tuple[Callable, PolicyEngineLogger]] = []
+
+# Partial results sent by workers to the server process, with the ID of their
+# task, created before the workers are forked so that each worker inherits it.
+_PROGRESS_QUEUE: SimpleQueue = None
+
+
+def _run_registered_endpoint(
+    index: int, task_id: int, params: dict, kwargs: dict
+) -> dict:
+    fn, logger = _REGISTERED_ENDPOINTS[index]
+    return PolicyEngineTask(fn, params, fn.__name__, kwargs, None, logger).run(
+        progress=lambda partial_result: _PROGRESS_QUEUE.put(
+            (task_id, partial_result)
+        )
+    )
+
+
+def _get_worker_pid() -> int:
+    return os.getpid()
+
+
+class ProcessTaskExecutor(TaskExecutor):
+    """Runs tasks in a pool of forked worker processes, avoiding contention on the GIL between concurrent CPU-bound tasks.
+
+    Workers inherit the state of the server process when they are forked (including any baseline microsimulations already built), and results (including partial results) are sent back to the server process to be stored in the cache. State changed by a task inside a worker (e.g. endpoint runtimes) stays in that worker.
+    """
+
+    def __init__(self, max_workers: int = 2, initializer: Callable = None):
+        """Initialises the executor.
+
+        Args:
+            max_workers (int, optional): The number of worker processes. Defaults to 2.
+            initializer (Callable, optional): A function called in each worker process when it starts, e.g. to start services whose threads aren't inherited.
+        """
+        global _PROGRESS_QUEUE
+        self.max_workers = max_workers
+        context = get_context("fork")
+        if _PROGRESS_QUEUE is None:
+            _PROGRESS_QUEUE = context.SimpleQueue()
+        self.pool = ProcessPoolExecutor(
+            max_workers, mp_context=context, initializer=initializer
+        )
+        self.endpoint_indices: Dict[Callable, int] = {}
+        self.task_ids = count()
+        self.running: Dict[int, PolicyEngineTask] = {}
+        self.lock = Lock()
+        self.progress_forwarder: Thread = None
+
+    def register(self, fn: Callable, logger: PolicyEngineLogger):
+        self.endpoint_indices[fn] = len(_REGISTERED_ENDPOINTS)
+        _REGISTERED_ENDPOINTS.append((fn, logger))
+
+    def start_workers(self):
+        """Forks every worker process now rather than on the first tasks, returning once the workers are running.
+
+        Must be called while the server has no other threads running (e.g. before starting cloud logging), as a thread holding a lock during the fork leaves it held in the workers.
+        """
+        wait(
+            [
+                self.pool.submit(_get_worker_pid)
+                for _ in range(self.max_workers)
+            ]
+        )
+
+    def _forward_progress(self):
+        while True:
+            task_id, partial_result = _PROGRESS_QUEUE.get()
+            task = self.running.get(task_id)
+            if task is None:
+                # The task completed meanwhile.
+                continue
+            try:
+                task.report_progress(partial_result)
+            except Exception as e:
+                task.logger.log(
+                    event="task_error",
+                    endpoint=task.endpoint,
+                    error=str(e),
+                    full_trace=traceback.format_exc(),
+                )
+
+    def run(self, task: PolicyEngineTask):
+        with self.lock:
+            # Started on first use, like the scheduler's dispatchers, so that
+            # it isn't running when the workers are forked.
+            if self.progress_forwarder is None:
+                self.progress_forwarder = Thread(
+                    target=self._forward_progress, daemon=True
+                )
+                self.progress_forwarder.start()
+        task_id = next(self.task_ids)
+        self.running[task_id] = task
+        task.start()
+        try:
+            result = self.pool.submit(
+                _run_registered_endpoint,
+                self.endpoint_indices[task.task],
+                task_id,
+                task.params,
+                task.kwargs,
+            ).result()
+        except Exception as e:
+            # The worker process died or the result couldn't be sent back.
+            result = {"status": "error", "error": str(e)}
+        finally:
+            del self.running[task_id]
+        task.complete(result)
+
+
+class TaskScheduler:
+    """Queues cached endpoint tasks for a fixed number of dispatcher threads, each running one task at a time on an executor.
+
+    Tasks are identified by their cache key: submitting a task while an identical one is queued or running returns the status of the existing task rather than computing it again.
+    """
+
+    def __init__(
+        self,
+        executor: TaskExecutor,
+        max_workers: int = 2,
+        max_queue_length: int = 16,
+    ):
+        """Initialises the scheduler.
+
+        Args:
+            executor (TaskExecutor): The backend running tasks.
+            max_workers (int, optional): The number of tasks run at once. Defaults to 2.
+            max_queue_length (int, optional): The number of tasks which can wait to run before new tasks are rejected. Defaults to 16.
+        """
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_queue_length = max_queue_length
+        self.queue: Deque[Tuple[str, PolicyEngineTask]] = deque()
+        # Places in the queue reserved by tasks being submitted.
+        self.reserved_places = 0
+        self.in_flight: Dict[str, PolicyEngineTask] = {}
+        self.condition = Condition()
+        self.dispatchers: List[Thread] = []
+
+    def _start_dispatchers(self):
+        # Started on first use rather than on initialisation, so that no
+        # threads are running when worker processes are forked.
+        while len(self.dispatchers) < self.max_workers:
+            dispatcher = Thread(target=self._dispatch, daemon=True)
+            dispatcher.start()
+            self.dispatchers.append(dispatcher)
+
+    def _dispatch(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                name, task = self.queue.popleft()
+            try:
+                self.executor.run(task)
+            except Exception as e:
+                task.logger.log(
+                    event="task_error",
+                    endpoint=task.endpoint,
+                    error=str(e),
+                    full_trace=traceback.format_exc(),
+                )
+            finally:
+                with self.condition:
+                    del self.in_flight[name]
+
+    def _status(self, name: str) -> dict:
+        task = self.in_flight[name]
+        if task.status == TaskStatus.COMPLETED:
+            # Until the dispatcher removes it, return the complete result
+            # rather than the last partial one.
+            return task.result
+        if task.status == TaskStatus.QUEUED:
+            for position, (queued_name, _) in enumerate(self.queue, 1):
+                if queued_name == name:
+                    return {"status": TaskStatus.QUEUED, "position": position}
+        return {**(task.partial_result or {}), "status": task.status}
+
+    def get_status(self, name: str) -> Optional[dict]:
+        """Gets the status of a queued or running task.
+
+        Args:
+            name (str): The cache key of the task.
+
+        Returns:
+            Optional[dict]: The status (with the queue position, if queued), or None if no such task is queued or running.
+        """
+        with self.condition:
+            if name in self.in_flight:
+                return self._status(name)
+
+    def submit(self, name: str, task: PolicyEngineTask) -> Optional[dict]:
+        """Queues a task, unless an identical task is already queued or running.
+
+        Args:
+            name (str): The cache key of the task.
+            task (PolicyEngineTask): The task.
+
+        Returns:
+            Optional[dict]: The status of the task, or None if the queue is full.
+        """
+        with self.condition:
+            if name in self.in_flight:
+                return self._status(name)
+            if len(self.queue) + self.reserved_places >= self.max_queue_length:
+                return None
+            self.in_flight[name] = task
+            self.reserved_places += 1
+        # Stored before any dispatcher can start the task, so that the queued
+        # status never replaces a later one. Identical requests in this
+        # process are served from memory meanwhile.
+        try:
+            task.mark_queued_in_cache()
+        finally:
+            with self.condition:
+                self._start_dispatchers()
+                self.reserved_places -= 1
+                self.queue.append((name, task))
+                self.condition.notify()
+                position = len(self.queue)
+        return {"status": TaskStatus.QUEUED, "position": position}